@@ -0,0 +1,167 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+class QueueFull(Exception):
+    """Raised when a work queue has no room for another request."""
+
+    def __init__(self, queue_name: str, retry_after: int):
+        super().__init__(f"The {queue_name} queue is full, please retry later")
+        self.queue_name = queue_name
+        self.retry_after = retry_after
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs out of time before its work is done."""
+
+class Deadline:
+    """Absolute point in time by which a request must finish."""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline, never negative."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self, stage: str):
+        """Raise DeadlineExceeded if the deadline has already passed."""
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline of {self.timeout:.1f}s exceeded during {stage}")
+
+class ReadWriteLock:
+    """Lock held by any number of readers at once or by a single writer.
+
+    Waiting writers keep new readers out, so a steady stream of searches
+    cannot starve index updates.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._condition:
+            while self._writer or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._condition:
+            self._writers_waiting += 1
+            try:
+                while self._writer or self._readers:
+                    self._condition.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+class WorkQueue:
+    """Bounded pool of worker threads for one kind of blocking work.
+
+    At most `max_workers` jobs run at once and at most `max_queued` more may
+    wait; beyond that `run` fails fast with QueueFull. A queue created with
+    `yield_to` holds its jobs back while that queue has work in flight, so
+    the other queue's requests are served first.
+    """
+
+    PRIORITY_POLL_INTERVAL = 0.02
+
+    def __init__(self, name: str, max_workers: int, max_queued: int, retry_after: int = 1,
+                 yield_to: Optional["WorkQueue"] = None):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.retry_after = retry_after
+        self.yield_to = yield_to
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-worker")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queued
+
+    def _acquire(self):
+        with self._lock:
+            if self.pending >= self.capacity:
+                self.rejected += 1
+                raise QueueFull(self.name, self.retry_after)
+            self.pending += 1
+
+    def _release(self, _future=None):
+        with self._lock:
+            self.pending -= 1
+
+    async def _wait_for_priority(self, deadline: Deadline):
+        while self.yield_to.pending > 0:
+            deadline.check(f"{self.name} queue")
+            await asyncio.sleep(self.PRIORITY_POLL_INTERVAL)
+
+    async def run(self, fn: Callable, *args, deadline: Deadline, pass_deadline: bool = True, **kwargs):
+        """Run `fn` on the queue's workers, failing if it cannot finish by `deadline`.
+
+        The deadline is passed on to `fn` as its `deadline` keyword unless
+        `pass_deadline` is False. A slot stays taken until the job actually
+        finishes, so work abandoned by a timed-out request still counts
+        against the queue's capacity.
+        """
+        if pass_deadline:
+            kwargs['deadline'] = deadline
+
+        self._acquire()
+        try:
+            if self.yield_to is not None:
+                await self._wait_for_priority(deadline)
+
+            def job():
+                # Skip work whose request already gave up while it was queued
+                deadline.check(f"{self.name} queue")
+                return fn(*args, **kwargs)
+
+            future = self._executor.submit(job)
+        except BaseException:
+            self._release()
+            raise
+
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=deadline.remaining())
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise DeadlineExceeded(f"Deadline of {deadline.timeout:.1f}s exceeded waiting for {self.name}")
+
+    def get_stats(self) -> dict:
+        return {
+            'pending': self.pending,
+            'capacity': self.capacity,
+            'rejected': self.rejected
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
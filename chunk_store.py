@@ -0,0 +1,166 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+class ChunkStore:
+    """Chunk text and metadata for every position of the vector index, kept as columns.
+
+    Each document's id and path are stored once in a document table that
+    rows refer to by number, the per-chunk fields are NumPy columns, and all
+    chunk text is a single UTF-8 buffer sliced by byte offsets. Loading a
+    large knowledge base therefore creates a handful of arrays instead of a
+    dict per chunk, and a chunk dict is only built when a row is read.
+
+    A store is never changed in place: `append`, `remove` and `with_shards`
+    return a new store, so readers holding the old one are unaffected.
+    """
+
+    def __init__(self, documents: List[Tuple[str, str]] = None, document: np.ndarray = None,
+                 chunk_index: np.ndarray = None, length: np.ndarray = None, shard: np.ndarray = None,
+                 text: bytes = b"", text_offsets: np.ndarray = None):
+        # (document_id, document_path) of every document with at least one chunk
+        self.documents = list(documents or [])
+        self.document = np.asarray(document if document is not None else [], dtype='int32')
+        self.chunk_index = np.asarray(chunk_index if chunk_index is not None else [], dtype='int32')
+        self.length = np.asarray(length if length is not None else [], dtype='int32')
+        # Shard of every row, or -1 where it is not known yet
+        self.shard = np.asarray(shard if shard is not None else np.full(len(self.document), -1), dtype='int32')
+        self.text = text
+        self.text_offsets = np.asarray(text_offsets if text_offsets is not None else [0], dtype='int64')
+
+        count = len(self.document)
+        if not (len(self.chunk_index) == len(self.length) == len(self.shard) == count
+                and len(self.text_offsets) == count + 1):
+            raise ValueError("Chunk store columns are out of sync")
+
+        self._codes = {document_id: code for code, (document_id, _) in enumerate(self.documents)}
+        self._lookup_keys = None
+        self._lookup_order = None
+
+    @classmethod
+    def from_chunks(cls, chunks: List[Dict], chunk_metadata: List[Dict] = None) -> "ChunkStore":
+        """Build a store from chunk dicts, such as those in the legacy pickle files."""
+        shards = None
+        if chunk_metadata:
+            shards = [-1 if metadata.get('shard') is None else metadata['shard'] for metadata in chunk_metadata]
+        return cls()._with_rows(chunks, shards)
+
+    def __len__(self) -> int:
+        return int(self.document.shape[0])
+
+    def __getitem__(self, position: int) -> Dict:
+        """The chunk dict stored at a position."""
+        document_id, document_path = self.documents[self.document[position]]
+        chunk_index = int(self.chunk_index[position])
+        start, end = self.text_offsets[position], self.text_offsets[position + 1]
+        return {
+            'id': f"{document_id}_chunk_{chunk_index}",
+            'document_id': document_id,
+            'document_path': document_path,
+            'chunk_index': chunk_index,
+            'text': self.text[start:end].decode('utf-8'),
+            'length': int(self.length[position])
+        }
+
+    def __iter__(self) -> Iterable[Dict]:
+        return (self[position] for position in range(len(self)))
+
+    def document_ids(self) -> List[str]:
+        """Owning document id of every row."""
+        ids = [document_id for document_id, _ in self.documents]
+        return [ids[code] for code in self.document.tolist()]
+
+    def indexed_documents(self) -> Dict[str, str]:
+        """Map of document id to the file path it was ingested from."""
+        return dict(self.documents)
+
+    def positions_of(self, document_id: str) -> np.ndarray:
+        """Positions of every chunk of a document."""
+        code = self._codes.get(document_id)
+        if code is None:
+            return np.empty(0, dtype='int64')
+        return np.flatnonzero(self.document == code).astype('int64')
+
+    def position(self, document_id: str, chunk_index: int) -> Optional[int]:
+        """Position of one chunk of a document, or None if it is not stored."""
+        code = self._codes.get(document_id)
+        if code is None or chunk_index < 0:
+            return None
+        if self._lookup_keys is None:
+            # Built on first use; concurrent readers may both build it, with the same result
+            keys = (self.document.astype('int64') << 32) | self.chunk_index.astype('int64')
+            order = np.argsort(keys, kind='stable')
+            self._lookup_order = order
+            self._lookup_keys = keys[order]
+        key = (code << 32) | chunk_index
+        found = int(np.searchsorted(self._lookup_keys, key))
+        if found < len(self._lookup_keys) and self._lookup_keys[found] == key:
+            return int(self._lookup_order[found])
+        return None
+
+    def append(self, chunks: List[Dict], shard: int) -> "ChunkStore":
+        """A new store with `chunks` added at the next positions."""
+        return self._with_rows(chunks, [shard] * len(chunks))
+
+    def _with_rows(self, chunks: List[Dict], shards: Optional[List[int]]) -> "ChunkStore":
+        documents = list(self.documents)
+        codes = dict(self._codes)
+        document_column = []
+        for chunk in chunks:
+            code = codes.get(chunk['document_id'])
+            if code is None:
+                code = codes[chunk['document_id']] = len(documents)
+                documents.append((chunk['document_id'], chunk['document_path']))
+            document_column.append(code)
+
+        encoded = [chunk['text'].encode('utf-8') for chunk in chunks]
+        text_offsets = np.cumsum([len(self.text)] + [len(text) for text in encoded], dtype='int64')
+
+        return ChunkStore(
+            documents,
+            np.concatenate([self.document, np.asarray(document_column, dtype='int32')]),
+            np.concatenate([self.chunk_index, np.asarray([chunk['chunk_index'] for chunk in chunks], dtype='int32')]),
+            np.concatenate([self.length, np.asarray(
+                [chunk.get('length', len(chunk['text'])) for chunk in chunks], dtype='int32')]),
+            np.concatenate([self.shard, np.asarray(shards if shards is not None else [-1] * len(chunks),
+                                                   dtype='int32')]),
+            b"".join([self.text, *encoded]),
+            np.concatenate([self.text_offsets[:-1], text_offsets])
+        )
+
+    def remove(self, positions: np.ndarray) -> "ChunkStore":
+        """A new store without the given positions; later positions shift down."""
+        positions = np.unique(np.asarray(positions, dtype='int64'))
+        if positions.shape[0] == 0:
+            return self
+
+        keep = np.ones(len(self), dtype=bool)
+        keep[positions] = False
+        kept = np.flatnonzero(keep)
+
+        # Copy the text of each run of kept rows in one slice
+        runs = np.split(kept, np.flatnonzero(np.diff(kept) != 1) + 1) if kept.shape[0] else []
+        view = memoryview(self.text)
+        text = b"".join(view[self.text_offsets[run[0]]:self.text_offsets[run[-1] + 1]] for run in runs)
+        lengths = self.text_offsets[kept + 1] - self.text_offsets[kept]
+        text_offsets = np.concatenate([[0], np.cumsum(lengths)]).astype('int64')
+
+        # Drop documents left without chunks and renumber the rest
+        document = self.document[kept]
+        used = np.zeros(len(self.documents), dtype=bool)
+        used[document] = True
+        renumber = np.cumsum(used, dtype='int32') - 1
+
+        return ChunkStore(
+            [entry for entry, is_used in zip(self.documents, used) if is_used],
+            renumber[document],
+            self.chunk_index[kept],
+            self.length[kept],
+            self.shard[kept],
+            text,
+            text_offsets
+        )
+
+    def with_shards(self, shard: np.ndarray) -> "ChunkStore":
+        """A new store with every row's shard replaced."""
+        return ChunkStore(self.documents, self.document, self.chunk_index, self.length,
+                          shard, self.text, self.text_offsets)
@@ -12,9 +12,42 @@ class Config:
     MAX_CHUNK_SIZE = int(os.getenv("MAX_CHUNK_SIZE", "1000"))
     CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
     
+    # Index sharding: documents are routed to shards by "hash" of their id or by "size"
+    NUM_SHARDS = int(os.getenv("NUM_SHARDS", "1"))
+    SHARD_STRATEGY = os.getenv("SHARD_STRATEGY", "hash")
+    SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "0")) or None
+    
+    # Diversity-aware retrieval: candidates fetched per requested result before MMR re-selection,
+    # up to a fixed number of candidates per query
+    MMR_FETCH_MULTIPLIER = int(os.getenv("MMR_FETCH_MULTIPLIER", "4"))
+    MMR_MAX_CANDIDATES = int(os.getenv("MMR_MAX_CANDIDATES", "200"))
+    # Most results a single search or query may ask for
+    MAX_TOP_K = int(os.getenv("MAX_TOP_K", "50"))
+    
+    # Admission control: concurrent workers and waiting slots per work queue
+    SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "4"))
+    SEARCH_QUEUE_SIZE = int(os.getenv("SEARCH_QUEUE_SIZE", "32"))
+    LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+    LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "32"))
+    INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "1"))
+    INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "4"))
+    RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "2"))
+    
+    # Per-request deadlines in seconds
+    SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "10"))
+    QUERY_TIMEOUT = float(os.getenv("QUERY_TIMEOUT", "30"))
+    UPLOAD_TIMEOUT = float(os.getenv("UPLOAD_TIMEOUT", "300"))
+    
     UPLOAD_DIR = "uploads"
     VECTOR_DB_PATH = "vector_db"
     
+    # Directory watcher: keeps WATCH_DIR in sync with the index when enabled in the app
+    WATCH_UPLOADS = os.getenv("WATCH_UPLOADS", "false").lower() in ("1", "true", "yes")
+    WATCH_DIR = os.getenv("WATCH_DIR", UPLOAD_DIR)
+    WATCH_INTERVAL = float(os.getenv("WATCH_INTERVAL", "2"))
+    WATCH_DEBOUNCE = float(os.getenv("WATCH_DEBOUNCE", "1"))
+    WATCH_BATCH_SIZE = int(os.getenv("WATCH_BATCH_SIZE", "16"))
+    
     # Ensure directories exist
     os.makedirs(UPLOAD_DIR, exist_ok=True)
     os.makedirs(VECTOR_DB_PATH, exist_ok=True)
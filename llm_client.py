@@ -1,6 +1,7 @@
 import requests
 import json
 from typing import Dict, List
+from admission import Deadline, DeadlineExceeded
 from config import Config
 
 class GroqLLMClient:
@@ -17,8 +18,18 @@ class GroqLLMClient:
             "Authorization": f"Bearer {self.api_key}"
         }
     
-    def generate_answer(self, query: str, context: str) -> Dict:
-        """Generate an answer using the LLM with provided context."""
+    REQUEST_TIMEOUT = 30
+    
+    def generate_answer(self, query: str, context: str, deadline: Deadline = None) -> Dict:
+        """Generate an answer using the LLM with provided context.
+        
+        With a `deadline`, the API call is limited to the time remaining and
+        DeadlineExceeded is raised if it runs out.
+        """
+        timeout = self.REQUEST_TIMEOUT
+        if deadline:
+            deadline.check("answer generation")
+            timeout = min(timeout, deadline.remaining())
         
         # Create the prompt for RAG
         system_prompt = """You are a helpful AI assistant that answers questions based on provided documents. 
@@ -54,7 +65,7 @@ Please provide a synthesized answer based on the context above."""
                 self.api_url,
                 headers=self.headers,
                 json=payload,
-                timeout=30
+                timeout=timeout
             )
             
             if response.status_code == 200:
@@ -74,6 +85,8 @@ Please provide a synthesized answer based on the context above."""
                 }
                 
         except requests.exceptions.Timeout:
+            if deadline and deadline.expired():
+                raise DeadlineExceeded(f"Deadline of {deadline.timeout:.1f}s exceeded during answer generation")
             return {
                 "success": False,
                 "error": "Request timed out"
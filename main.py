@@ -1,15 +1,20 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Header, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse
-from pydantic import BaseModel
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field
 import os
 import shutil
+import asyncio
+import tempfile
 from typing import List, Optional
 import uvicorn
 
 from rag_system import RAGSystem
 from llm_client import GroqLLMClient
+from admission import WorkQueue, Deadline, DeadlineExceeded, QueueFull
+from watcher import DirectoryWatcher
 from config import Config
 
 # Initialize FastAPI app
@@ -33,21 +38,92 @@ config = Config()
 rag_system = RAGSystem()
 llm_client = GroqLLMClient()
 
+# Bounded work queues; ingestion yields to search so interactive latency holds during bulk loads
+search_queue = WorkQueue("search", config.SEARCH_CONCURRENCY, config.SEARCH_QUEUE_SIZE,
+                         retry_after=config.RETRY_AFTER_SECONDS)
+llm_queue = WorkQueue("llm", config.LLM_CONCURRENCY, config.LLM_QUEUE_SIZE,
+                      retry_after=config.RETRY_AFTER_SECONDS)
+ingest_queue = WorkQueue("ingest", config.INGEST_CONCURRENCY, config.INGEST_QUEUE_SIZE,
+                         retry_after=config.RETRY_AFTER_SECONDS, yield_to=search_queue)
+
+directory_watcher = DirectoryWatcher(rag_system) if config.WATCH_UPLOADS else None
+
+def ingest_queue_runner(loop: asyncio.AbstractEventLoop, watcher: DirectoryWatcher):
+    """Job runner for the watcher thread that queues its work on the ingestion queue."""
+    def run_job(fn, *args, **kwargs):
+        while True:
+            future = asyncio.run_coroutine_threadsafe(
+                ingest_queue.run(fn, *args, deadline=Deadline(config.UPLOAD_TIMEOUT),
+                                 pass_deadline=False, **kwargs),
+                loop
+            )
+            try:
+                return future.result()
+            except QueueFull as e:
+                # Uploads take precedence; wait for room instead of dropping the change,
+                # unless the watcher is stopping, in which case the next run redoes it
+                if watcher.wait(e.retry_after):
+                    raise
+    return run_job
+
+@app.on_event("startup")
+async def start_watcher():
+    if directory_watcher is not None:
+        directory_watcher.run_job = ingest_queue_runner(asyncio.get_running_loop(), directory_watcher)
+        directory_watcher.start()
+
+@app.on_event("shutdown")
+async def stop_watcher():
+    if directory_watcher is not None:
+        # The watcher thread may be waiting on a job scheduled on this loop,
+        # so it is joined from a worker thread while the loop keeps running
+        await asyncio.to_thread(directory_watcher.stop)
+
+@app.exception_handler(QueueFull)
+async def queue_full_handler(request: Request, exc: QueueFull):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(config.RETRY_AFTER_SECONDS)}
+    )
+
+def request_deadline(default_timeout: float, requested_timeout: Optional[float]) -> Deadline:
+    """Deadline for a request; clients may ask for less time than the default, never more."""
+    if requested_timeout is not None and requested_timeout > 0:
+        return Deadline(min(requested_timeout, default_timeout))
+    return Deadline(default_timeout)
+
 # Pydantic models
 class QueryRequest(BaseModel):
     query: str
-    max_chunks: Optional[int] = 3
+    max_chunks: Optional[int] = Field(3, ge=1, le=config.MAX_TOP_K)
+    diversity: Optional[float] = Field(None, ge=0.0, le=1.0)
+    neighbors: int = Field(0, ge=0, le=5)
 
 class QueryResponse(BaseModel):
     success: bool
     answer: Optional[str] = None
     sources: Optional[List[dict]] = None
     error: Optional[str] = None
+    diversity_ms: Optional[float] = None
 
 class DocumentStats(BaseModel):
     total_documents: int
     total_chunks: int
     documents: List[str]
+    shard_sizes: Optional[List[int]] = None
+
+class RebalanceRequest(BaseModel):
+    num_shards: Optional[int] = None
+    strategy: Optional[str] = None
 
 # API Routes
 @app.get("/", response_class=HTMLResponse)
@@ -70,10 +146,34 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy", "message": "Knowledge Base Search Engine is running"}
+    return {
+        "status": "healthy",
+        "message": "Knowledge Base Search Engine is running",
+        "queues": {
+            queue.name: queue.get_stats() for queue in (search_queue, llm_queue, ingest_queue)
+        }
+    }
+
+def ingest_upload(file: UploadFile, file_path: str, deadline: Deadline) -> dict:
+    """Save an uploaded file and add it to the knowledge base, removing it on failure."""
+    try:
+        with open(file_path, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+        
+        # Re-uploading a file replaces its previous chunks instead of duplicating them
+        result = rag_system.add_document(file_path, deadline=deadline, replace=True)
+    except Exception:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    
+    if not result["success"] and os.path.exists(file_path):
+        os.remove(file_path)
+    return result
 
 @app.post("/upload")
-async def upload_document(file: UploadFile = File(...)):
+async def upload_document(file: UploadFile = File(...),
+                          x_request_timeout: Optional[float] = Header(None)):
     """Upload and process a document."""
     
     # Validate file type
@@ -86,54 +186,54 @@ async def upload_document(file: UploadFile = File(...)):
             detail=f"Unsupported file type. Allowed types: {', '.join(allowed_extensions)}"
         )
     
+    deadline = request_deadline(config.UPLOAD_TIMEOUT, x_request_timeout)
+    file_path = os.path.join(config.UPLOAD_DIR, file.filename)
+    
     try:
-        # Save uploaded file
-        file_path = os.path.join(config.UPLOAD_DIR, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Process document with RAG system
-        result = rag_system.add_document(file_path)
-        
-        if result["success"]:
-            return {
-                "success": True,
-                "message": result["message"],
-                "document_id": result["document_id"],
-                "chunks_count": result["chunks_count"],
-                "filename": file.filename
-            }
-        else:
-            # Clean up file if processing failed
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            raise HTTPException(status_code=500, detail=result["message"])
-            
+        # Save and process the document on the ingestion queue
+        result = await ingest_queue.run(ingest_upload, file, file_path, deadline=deadline)
+    except (QueueFull, DeadlineExceeded):
+        raise
     except Exception as e:
-        # Clean up file if error occurred
-        if 'file_path' in locals() and os.path.exists(file_path):
-            os.remove(file_path)
         raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
+    
+    if result["success"]:
+        return {
+            "success": True,
+            "message": result["message"],
+            "document_id": result["document_id"],
+            "chunks_count": result["chunks_count"],
+            "filename": file.filename
+        }
+    else:
+        raise HTTPException(status_code=500, detail=result["message"])
 
 @app.post("/query", response_model=QueryResponse)
-async def query_documents(request: QueryRequest):
+async def query_documents(request: QueryRequest, x_request_timeout: Optional[float] = Header(None)):
     """Query the knowledge base and get an AI-generated answer."""
     
+    deadline = request_deadline(config.QUERY_TIMEOUT, x_request_timeout)
+    
     try:
-        # Get relevant context from RAG system
-        context = rag_system.get_context_for_query(request.query, max_chunks=request.max_chunks)
+        # Get relevant chunks, used both as LLM context and as sources
+        retrieval = await search_queue.run(
+            rag_system.retrieve, request.query, top_k=request.max_chunks, deadline=deadline,
+            diversity=request.diversity, neighbors=request.neighbors
+        )
+        relevant_chunks = retrieval["results"]
         
-        if context == "No relevant documents found.":
+        if not relevant_chunks:
             return QueryResponse(
                 success=False,
                 error="No relevant documents found for your query. Please upload some documents first."
             )
         
-        # Get relevant chunks for sources
-        relevant_chunks = rag_system.search(request.query, top_k=request.max_chunks)
+        context = rag_system.build_context(relevant_chunks)
         
         # Generate answer using LLM
-        llm_result = llm_client.generate_answer(request.query, context)
+        llm_result = await llm_queue.run(
+            llm_client.generate_answer, request.query, context, deadline=deadline
+        )
         
         if llm_result["success"]:
             # Format sources
@@ -148,7 +248,8 @@ async def query_documents(request: QueryRequest):
             return QueryResponse(
                 success=True,
                 answer=llm_result["answer"],
-                sources=sources
+                sources=sources,
+                diversity_ms=retrieval["diversity_ms"]
             )
         else:
             return QueryResponse(
@@ -156,6 +257,8 @@ async def query_documents(request: QueryRequest):
                 error=f"Error generating answer: {llm_result['error']}"
             )
             
+    except (QueueFull, DeadlineExceeded):
+        raise
     except Exception as e:
         return QueryResponse(
             success=False,
@@ -163,17 +266,29 @@ async def query_documents(request: QueryRequest):
         )
 
 @app.get("/search")
-async def search_documents(query: str, top_k: int = 5):
+async def search_documents(query: str, top_k: int = Query(5, ge=1, le=config.MAX_TOP_K),
+                           diversity: Optional[float] = Query(None, ge=0.0, le=1.0),
+                           neighbors: int = Query(0, ge=0, le=5),
+                           x_request_timeout: Optional[float] = Header(None)):
     """Search for relevant document chunks."""
     
+    deadline = request_deadline(config.SEARCH_TIMEOUT, x_request_timeout)
+    
     try:
-        results = rag_system.search(query, top_k=top_k)
+        retrieval = await search_queue.run(
+            rag_system.retrieve, query, top_k=top_k, deadline=deadline,
+            diversity=diversity, neighbors=neighbors
+        )
+        results = retrieval["results"]
         return {
             "success": True,
             "query": query,
             "results": results,
-            "count": len(results)
+            "count": len(results),
+            "diversity_ms": retrieval["diversity_ms"]
         }
+    except (QueueFull, DeadlineExceeded):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching documents: {str(e)}")
 
@@ -186,11 +301,34 @@ async def get_stats():
         return DocumentStats(
             total_documents=stats["total_documents"],
             total_chunks=stats["total_chunks"],
-            documents=stats["documents"]
+            documents=stats["documents"],
+            shard_sizes=stats["shard_sizes"]
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting stats: {str(e)}")
 
+@app.post("/shards/rebalance")
+async def rebalance_shards(request: RebalanceRequest, x_request_timeout: Optional[float] = Header(None)):
+    """Redistribute the index across shards, optionally changing shard count or strategy."""
+    
+    if request.num_shards is not None and request.num_shards < 1:
+        raise HTTPException(status_code=400, detail="num_shards must be at least 1")
+    
+    if request.strategy is not None and request.strategy not in ("hash", "size"):
+        raise HTTPException(status_code=400, detail="strategy must be 'hash' or 'size'")
+    
+    deadline = request_deadline(config.UPLOAD_TIMEOUT, x_request_timeout)
+    
+    # Rebuilding every shard is heavy, so it runs on the ingestion workers rather than the event loop
+    result = await ingest_queue.run(
+        rag_system.rebalance_shards, num_shards=request.num_shards, strategy=request.strategy,
+        deadline=deadline, pass_deadline=False
+    )
+    if result["success"]:
+        return result
+    else:
+        raise HTTPException(status_code=500, detail=result["message"])
+
 @app.get("/test-llm")
 async def test_llm_connection():
     """Test the connection to Groq LLM API."""
@@ -201,18 +339,97 @@ async def test_llm_connection():
     else:
         raise HTTPException(status_code=500, detail=result["error"])
 
+def _remove_file(path: str):
+    if os.path.exists(path):
+        os.remove(path)
+
+def _snapshot_temp_path() -> str:
+    fd, path = tempfile.mkstemp(suffix=".kbsnap", dir=config.VECTOR_DB_PATH)
+    os.close(fd)
+    return path
+
+@app.get("/snapshot/export")
+async def export_snapshot(compression: str = "none", x_request_timeout: Optional[float] = Header(None)):
+    """Download the whole knowledge base as a single snapshot file."""
+    
+    if compression not in ("none", "zlib"):
+        raise HTTPException(status_code=400, detail="compression must be 'none' or 'zlib'")
+    
+    deadline = request_deadline(config.UPLOAD_TIMEOUT, x_request_timeout)
+    snapshot_path = _snapshot_temp_path()
+    
+    try:
+        result = await ingest_queue.run(
+            rag_system.export_snapshot, snapshot_path, compression=compression,
+            deadline=deadline, pass_deadline=False
+        )
+    except BaseException:
+        _remove_file(snapshot_path)
+        raise
+    
+    if not result["success"]:
+        _remove_file(snapshot_path)
+        raise HTTPException(status_code=500, detail=result["message"])
+    
+    return FileResponse(
+        snapshot_path,
+        media_type="application/octet-stream",
+        filename="knowledge_base.kbsnap",
+        background=BackgroundTask(_remove_file, snapshot_path)
+    )
+
+@app.post("/snapshot/import")
+async def import_snapshot(file: UploadFile = File(...), x_request_timeout: Optional[float] = Header(None)):
+    """Replace the knowledge base with an uploaded snapshot file."""
+    
+    deadline = request_deadline(config.UPLOAD_TIMEOUT, x_request_timeout)
+    snapshot_path = _snapshot_temp_path()
+    
+    def save_and_import():
+        try:
+            with open(snapshot_path, "wb") as buffer:
+                shutil.copyfileobj(file.file, buffer)
+            return rag_system.import_snapshot(snapshot_path, move=True)
+        finally:
+            _remove_file(snapshot_path)
+    
+    try:
+        result = await ingest_queue.run(save_and_import, deadline=deadline, pass_deadline=False)
+    except BaseException:
+        _remove_file(snapshot_path)
+        raise
+    
+    if result["success"]:
+        return result
+    elif result.get("invalid"):
+        # The uploaded file is at fault: corrupt, unrecognised or built for another model
+        raise HTTPException(status_code=400, detail=result["message"])
+    else:
+        raise HTTPException(status_code=500, detail=result["message"])
+
+@app.get("/watcher")
+async def watcher_status():
+    """Progress of the directory watcher."""
+    
+    if directory_watcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **directory_watcher.get_status()}
+
 @app.delete("/documents/{document_id}")
-async def delete_document(document_id: str):
-    """Delete a document from the knowledge base (placeholder - requires index rebuild)."""
+async def delete_document(document_id: str, x_request_timeout: Optional[float] = Header(None)):
+    """Delete a document from the knowledge base."""
     
-    # Note: This is a simplified implementation
-    # In a production system, you'd want to implement proper document deletion
-    # which would require rebuilding the FAISS index
+    deadline = request_deadline(config.UPLOAD_TIMEOUT, x_request_timeout)
     
-    return {
-        "success": False,
-        "message": "Document deletion not implemented. This would require index rebuilding."
-    }
+    # Compacting the shards and saving is index work, so it runs on the ingestion workers
+    result = await ingest_queue.run(rag_system.remove_document, document_id,
+                                    deadline=deadline, pass_deadline=False)
+    if result["success"]:
+        return result
+    elif result["message"].startswith("Document not found"):
+        raise HTTPException(status_code=404, detail=result["message"])
+    else:
+        raise HTTPException(status_code=500, detail=result["message"])
 
 # Mount static files for frontend
 try:
@@ -1,31 +1,59 @@
 import os
 import json
 import pickle
+import shutil
+import time
+import threading
 from typing import List, Dict, Tuple
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
 from document_processor import DocumentProcessor
+from sharded_index import ShardedIndex
+from chunk_store import ChunkStore
+from admission import Deadline, DeadlineExceeded, ReadWriteLock
+from snapshot import SnapshotError, read_snapshot, write_snapshot
 from config import Config
 
 class RAGSystem:
     """Retrieval-Augmented Generation system for document search and retrieval."""
     
-    def __init__(self):
+    def __init__(self, embedding_model=None):
         self.config = Config()
-        self.embedding_model = SentenceTransformer(self.config.EMBEDDING_MODEL)
+        if embedding_model is None:
+            # Imported here so that callers passing their own model do not need the library
+            from sentence_transformers import SentenceTransformer
+            embedding_model = SentenceTransformer(self.config.EMBEDDING_MODEL)
+        self.embedding_model = embedding_model
         self.document_processor = DocumentProcessor(
             max_chunk_size=self.config.MAX_CHUNK_SIZE,
             chunk_overlap=self.config.CHUNK_OVERLAP
         )
         
-        # Initialize FAISS index
+        # Initialize sharded FAISS index (inner product for cosine similarity)
         self.dimension = self.embedding_model.get_sentence_embedding_dimension()
-        self.index = faiss.IndexFlatIP(self.dimension)  # Inner product for cosine similarity
+        self.index = ShardedIndex(
+            self.dimension,
+            num_shards=self.config.NUM_SHARDS,
+            strategy=self.config.SHARD_STRATEGY,
+            max_workers=self.config.SEARCH_WORKERS
+        )
+        
+        # Chunk text and metadata, one row per vector in global order
+        self.chunks = ChunkStore()
+        
+        # The knowledge base is kept on disk as a single uncompressed snapshot
+        self.store_path = os.path.join(self.config.VECTOR_DB_PATH, "knowledge_base.kbsnap")
+        
+        # Searches share the index and chunks under the read lock and updates
+        # swap them under the write lock. Updates are serialized by the
+        # mutation lock, so they can prepare new state while searches go on.
+        self._lock = ReadWriteLock()
+        self._mutation_lock = threading.Lock()
         
-        # Storage for document chunks and metadata
-        self.chunks = []
-        self.chunk_metadata = []
+        # Every update bumps the generation; saves skip state already on disk
+        self._save_lock = threading.Lock()
+        self._generation = 0
+        self._saved_generation = 0
         
         # Load existing index if available
         self.load_index()
@@ -35,8 +63,17 @@ class RAGSystem:
         norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
         return embeddings / norms
     
-    def add_document(self, file_path: str, document_id: str = None) -> Dict:
-        """Add a document to the knowledge base."""
+    def add_document(self, file_path: str, document_id: str = None, deadline: Deadline = None,
+                     replace: bool = False, save: bool = True) -> Dict:
+        """Add a document to the knowledge base.
+        
+        A document id already held by a different file is never reused; the
+        document is stored under a free variant instead (see
+        `_resolve_document_id`) and the id actually used is returned. With
+        `replace`, chunks already stored for the same file are swapped out in
+        the same step. If `deadline` passes before the chunks are stored,
+        DeadlineExceeded is raised and the index is left unchanged.
+        """
         try:
             # Process document into chunks
             chunks = self.document_processor.process_document(file_path, document_id)
@@ -44,73 +81,253 @@ class RAGSystem:
             if not chunks:
                 return {"success": False, "message": "No text extracted from document"}
             
+            if deadline:
+                deadline.check("document embedding")
+            
             # Generate embeddings for chunks
             chunk_texts = [chunk['text'] for chunk in chunks]
             embeddings = self.embedding_model.encode(chunk_texts)
             embeddings = self.normalize_embeddings(embeddings)
             
-            # Add to FAISS index
-            start_idx = len(self.chunks)
-            self.index.add(embeddings.astype('float32'))
+            if deadline:
+                deadline.check("document indexing")
             
-            # Store chunks and metadata
-            self.chunks.extend(chunks)
-            for i, chunk in enumerate(chunks):
-                self.chunk_metadata.append({
-                    'index': start_idx + i,
-                    'document_id': chunk['document_id'],
-                    'document_path': chunk['document_path'],
-                    'chunk_id': chunk['id'],
-                    'chunk_index': chunk['chunk_index']
-                })
+            with self._mutation_lock:
+                document_id = self._resolve_document_id(chunks[0]['document_id'], file_path)
+                if document_id != chunks[0]['document_id']:
+                    for chunk in chunks:
+                        chunk['document_id'] = document_id
+                        chunk['id'] = f"{document_id}_chunk_{chunk['chunk_index']}"
+                
+                # Build the new chunk store while searches still use the current one
+                replaced = self.chunks.positions_of(document_id) if replace else np.empty(0, dtype='int64')
+                shard = self.index.route(document_id)
+                chunk_store = self.chunks.remove(replaced).append(chunks, shard)
+                
+                with self._lock.write():
+                    self.index.remove(replaced)
+                    self.index.add(embeddings.astype('float32'), shard)
+                    self.chunks = chunk_store
+                    self._generation += 1
             
             # Save updated index
-            self.save_index()
+            if save:
+                self.save_index()
             
             return {
                 "success": True,
                 "message": f"Successfully added {len(chunks)} chunks from document",
-                "document_id": chunks[0]['document_id'],
+                "document_id": document_id,
                 "chunks_count": len(chunks)
             }
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             return {"success": False, "message": f"Error processing document: {str(e)}"}
     
-    def search(self, query: str, top_k: int = 5) -> List[Dict]:
+    def _resolve_document_id(self, document_id: str, file_path: str) -> str:
+        """Id to store a file's chunks under without touching another file's chunks.
+        
+        The requested id is kept if it is free or already held by the same
+        file. Otherwise the file extension is appended (`report` becomes
+        `report.txt` when `report.pdf` holds `report`), then a numeric suffix.
+        Callers must hold the mutation lock.
+        """
+        owners = self.chunks.indexed_documents()
+        path = os.path.abspath(file_path)
+        extension = os.path.splitext(file_path)[1].lower()
+        
+        candidates = [document_id]
+        if extension and not document_id.endswith(extension):
+            candidates.append(f"{document_id}{extension}")
+        base = candidates[-1]
+        suffix = 2
+        while True:
+            for candidate in candidates:
+                owner = owners.get(candidate)
+                if owner is None or os.path.abspath(owner) == path:
+                    return candidate
+            candidates = [f"{base}_{suffix}"]
+            suffix += 1
+    
+    def remove_document(self, document_id: str, save: bool = True) -> Dict:
+        """Remove a document from the knowledge base without re-encoding the rest."""
+        try:
+            with self._mutation_lock:
+                positions = self.chunks.positions_of(document_id)
+                removed = len(positions)
+                if removed:
+                    chunk_store = self.chunks.remove(positions)
+                    with self._lock.write():
+                        self.index.remove(positions)
+                        self.chunks = chunk_store
+                        self._generation += 1
+            
+            if not removed:
+                return {"success": False, "message": f"Document not found: {document_id}"}
+            
+            if save:
+                self.save_index()
+            
+            return {
+                "success": True,
+                "message": f"Successfully removed {removed} chunks from document",
+                "document_id": document_id,
+                "chunks_count": removed
+            }
+            
+        except Exception as e:
+            return {"success": False, "message": f"Error removing document: {str(e)}"}
+    
+    def indexed_documents(self) -> Dict[str, str]:
+        """Map of document id to the file path it was ingested from."""
+        with self._lock.read():
+            return self.chunks.indexed_documents()
+    
+    def search(self, query: str, top_k: int = 5, deadline: Deadline = None,
+               diversity: float = None, neighbors: int = 0) -> List[Dict]:
         """Search for relevant chunks based on query."""
+        return self.retrieve(query, top_k=top_k, deadline=deadline,
+                             diversity=diversity, neighbors=neighbors)['results']
+    
+    def retrieve(self, query: str, top_k: int = 5, deadline: Deadline = None,
+                 diversity: float = None, neighbors: int = 0) -> Dict:
+        """Search for relevant chunks, optionally diversified and expanded with neighbours.
+        
+        `diversity` (0-1) re-selects the top-k from an over-fetched candidate set
+        with maximal marginal relevance, trading query relevance for dissimilarity
+        to chunks already picked. `neighbors` adds up to that many adjacent chunks
+        on each side of every hit. The time spent on both, including the
+        over-fetched search, is returned as `diversity_ms`.
+        """
         if self.index.ntotal == 0:
-            return []
+            return {'results': [], 'diversity_ms': 0.0}
         
         # Generate query embedding
         query_embedding = self.embedding_model.encode([query])
-        query_embedding = self.normalize_embeddings(query_embedding)
+        query_embedding = self.normalize_embeddings(query_embedding).astype('float32')
+        
+        if deadline:
+            deadline.check("vector search")
         
-        # Search in FAISS index
-        scores, indices = self.index.search(query_embedding.astype('float32'), top_k)
+        rerank = bool(diversity) and top_k > 1
+        fetch_k = top_k
+        if rerank:
+            # Never fewer candidates than results, but no more than the cap beyond that
+            fetch_k = max(top_k, min(top_k * self.config.MMR_FETCH_MULTIPLIER,
+                                     self.config.MMR_MAX_CANDIDATES))
         
-        # Prepare results
-        results = []
-        for score, idx in zip(scores[0], indices[0]):
-            if idx < len(self.chunks):
+        with self._lock.read():
+            started = time.perf_counter()
+            
+            # Search all shards and merge the top-k
+            scores, indices = self.index.search(query_embedding, fetch_k)
+            valid = (indices[0] >= 0) & (indices[0] < len(self.chunks))
+            scores, indices = scores[0][valid], indices[0][valid]
+            
+            if rerank:
+                selected = self._mmr_select(scores, indices, top_k, 1.0 - diversity)
+                scores, indices = scores[selected], indices[selected]
+            else:
+                # Only re-selection needs the larger search, so timing starts here
+                started = time.perf_counter()
+            
+            hits = [(int(idx), float(score), None) for score, idx in zip(scores, indices)]
+            if neighbors > 0:
+                hits = self._expand_neighbors(hits, query_embedding[0], neighbors)
+            extra_ms = (time.perf_counter() - started) * 1000 if rerank or neighbors > 0 else 0.0
+            
+            # Prepare results
+            results = []
+            for idx, score, neighbor_of in hits:
                 chunk = self.chunks[idx]
-                metadata = self.chunk_metadata[idx]
-                
-                results.append({
+                result = {
                     'chunk_id': chunk['id'],
                     'document_id': chunk['document_id'],
                     'document_path': chunk['document_path'],
                     'text': chunk['text'],
-                    'score': float(score),
+                    'score': score,
                     'chunk_index': chunk['chunk_index']
-                })
+                }
+                if neighbor_of is not None:
+                    result['neighbor_of'] = neighbor_of
+                results.append(result)
+        
+        return {'results': results, 'diversity_ms': round(extra_ms, 3)}
+    
+    def _mmr_select(self, scores: np.ndarray, indices: np.ndarray, top_k: int,
+                    relevance_weight: float) -> List[int]:
+        """Pick top_k candidate positions by maximal marginal relevance.
         
-        return results
+        Uses the stored, already normalized embeddings, so nothing is
+        re-encoded. Only the similarity of each picked candidate to the rest
+        is computed, keeping memory linear in the number of candidates.
+        """
+        count = len(indices)
+        if count <= 1:
+            return list(range(count))
+        
+        candidates = self.index.reconstruct(indices)
+        relevance = relevance_weight * scores
+        
+        # Highest similarity of each candidate to anything selected so far
+        redundancy = np.full(count, -np.inf, dtype='float32')
+        available = np.ones(count, dtype=bool)
+        selected = []
+        
+        for _ in range(min(top_k, count)):
+            if selected:
+                mmr = relevance - (1.0 - relevance_weight) * redundancy
+            else:
+                mmr = relevance.copy()
+            mmr[~available] = -np.inf
+            best = int(np.argmax(mmr))
+            selected.append(best)
+            available[best] = False
+            redundancy = np.maximum(redundancy, candidates @ candidates[best])
+        
+        return selected
+    
+    def _expand_neighbors(self, hits: List[Tuple[int, float, str]], query_embedding: np.ndarray,
+                          window: int) -> List[Tuple[int, float, str]]:
+        """Surround each hit with its adjacent chunks from the same document, in reading order."""
+        seen = set(idx for idx, _, _ in hits)
+        groups = []
+        pending = []
+        
+        for idx, score, _ in hits:
+            chunk = self.chunks[idx]
+            before, after = [], []
+            for offset in range(1, window + 1):
+                for neighbor_index, side in ((chunk['chunk_index'] - offset, before),
+                                             (chunk['chunk_index'] + offset, after)):
+                    neighbor = self.chunks.position(chunk['document_id'], neighbor_index)
+                    if neighbor is not None and neighbor not in seen:
+                        seen.add(neighbor)
+                        side.append(neighbor)
+                        pending.append(neighbor)
+            groups.append((before[::-1], (idx, score, None), after, chunk['id']))
+        
+        # Score neighbours against the query from their stored embeddings
+        neighbor_scores = {}
+        if pending:
+            vectors = self.index.reconstruct(np.array(pending, dtype='int64'))
+            neighbor_scores = dict(zip(pending, (vectors @ query_embedding).tolist()))
+        
+        expanded = []
+        for before, hit, after, chunk_id in groups:
+            expanded.extend((idx, neighbor_scores[idx], chunk_id) for idx in before)
+            expanded.append(hit)
+            expanded.extend((idx, neighbor_scores[idx], chunk_id) for idx in after)
+        return expanded
     
     def get_context_for_query(self, query: str, max_chunks: int = 3) -> str:
         """Get relevant context for a query to use in LLM prompt."""
-        relevant_chunks = self.search(query, top_k=max_chunks)
-        
+        return self.build_context(self.search(query, top_k=max_chunks))
+    
+    def build_context(self, relevant_chunks: List[Dict]) -> str:
+        """Format search results as context for the LLM prompt."""
         if not relevant_chunks:
             return "No relevant documents found."
         
@@ -120,52 +337,247 @@ class RAGSystem:
         
         return "\n\n".join(context_parts)
     
-    def save_index(self):
-        """Save FAISS index and metadata to disk."""
+    def save_index(self) -> bool:
+        """Save the index and chunks to disk as a single snapshot file.
+        
+        The state is captured under the read lock and written outside it, so
+        searches carry on during the write. A save that finds the current
+        state already on disk does nothing, so a burst of updates that each
+        ask for a save costs one or two writes. Returns False if the write
+        failed, leaving the previous store on disk.
+        """
         try:
-            # Save FAISS index
-            faiss.write_index(self.index, os.path.join(self.config.VECTOR_DB_PATH, "faiss_index.bin"))
-            
-            # Save chunks and metadata
-            with open(os.path.join(self.config.VECTOR_DB_PATH, "chunks.pkl"), 'wb') as f:
-                pickle.dump(self.chunks, f)
-            
-            with open(os.path.join(self.config.VECTOR_DB_PATH, "metadata.pkl"), 'wb') as f:
-                pickle.dump(self.chunk_metadata, f)
+            with self._save_lock:
+                with self._lock.read():
+                    generation = self._generation
+                    if generation == self._saved_generation:
+                        return True
+                    vectors = self.index.reconstruct_all()
+                    chunk_store = self.chunks
+                    num_shards, strategy = self.index.num_shards, self.index.strategy
+                
+                write_snapshot(self.store_path, vectors, chunk_store, self.config.EMBEDDING_MODEL,
+                               num_shards=num_shards, shard_strategy=strategy)
+                self._saved_generation = generation
+            return True
                 
         except Exception as e:
             print(f"Error saving index: {e}")
+            return False
     
     def load_index(self):
-        """Load FAISS index and metadata from disk."""
+        """Load the knowledge base from disk.
+        
+        The shard count and strategy saved with the store take precedence
+        over the configured ones, so a rebalance survives a restart. Falls
+        back to the FAISS and pickle files written by earlier versions, and
+        converts them to the snapshot store on first load.
+        """
         try:
             index_path = os.path.join(self.config.VECTOR_DB_PATH, "faiss_index.bin")
             chunks_path = os.path.join(self.config.VECTOR_DB_PATH, "chunks.pkl")
             metadata_path = os.path.join(self.config.VECTOR_DB_PATH, "metadata.pkl")
             
-            if os.path.exists(index_path) and os.path.exists(chunks_path) and os.path.exists(metadata_path):
-                # Load FAISS index
-                self.index = faiss.read_index(index_path)
+            if os.path.exists(self.store_path):
+                snapshot = read_snapshot(self.store_path)
+                header = snapshot['header']
+                self._check_compatible(header)
+                vectors, chunk_store = snapshot['vectors'], snapshot['store']
+                migrated = False
                 
-                # Load chunks and metadata
-                with open(chunks_path, 'rb') as f:
-                    self.chunks = pickle.load(f)
+                if 'num_shards' in header:
+                    self.index.close()
+                    self.index = ShardedIndex(
+                        self.dimension,
+                        num_shards=header['num_shards'],
+                        strategy=header['shard_strategy'],
+                        max_workers=self.config.SEARCH_WORKERS
+                    )
                 
+            elif os.path.exists(index_path) and os.path.exists(chunks_path) and os.path.exists(metadata_path):
+                flat_index = faiss.read_index(index_path)
+                vectors = flat_index.reconstruct_n(0, flat_index.ntotal)
+                
+                with open(chunks_path, 'rb') as f:
+                    chunks = pickle.load(f)
                 with open(metadata_path, 'rb') as f:
-                    self.chunk_metadata = pickle.load(f)
+                    chunk_metadata = pickle.load(f)
+                chunk_store = ChunkStore.from_chunks(chunks, chunk_metadata)
+                migrated = True
                 
-                print(f"Loaded existing index with {len(self.chunks)} chunks")
+            else:
+                return
+            
+            # Distribute vectors to shards, keeping stored assignments that are still valid
+            assignment = self._shard_assignment(chunk_store, self.index)
+            self.index.assign(vectors, assignment)
+            self.chunks = chunk_store.with_shards(assignment)
+            
+            if migrated:
+                self._generation += 1
+                self.save_index()
+            
+            print(f"Loaded existing index with {len(self.chunks)} chunks "
+                  f"across {self.index.num_shards} shard(s)")
             
         except Exception as e:
             print(f"Error loading index: {e}")
     
+    def _check_compatible(self, header: Dict):
+        """Raise SnapshotError if a snapshot was built with a different embedding model."""
+        if header['dimension'] != self.dimension:
+            raise SnapshotError(f"Snapshot dimension {header['dimension']} does not match "
+                                f"the embedding model dimension {self.dimension}")
+        if header['embedding_model'] != self.config.EMBEDDING_MODEL:
+            raise SnapshotError(f"Snapshot was built with {header['embedding_model']}, "
+                                f"not {self.config.EMBEDDING_MODEL}")
+    
+    def export_snapshot(self, path: str, compression: str = "none") -> Dict:
+        """Write the whole knowledge base to a single portable snapshot file."""
+        try:
+            with self._lock.read():
+                vectors = self.index.reconstruct_all()
+                chunk_store = self.chunks
+                num_shards, strategy = self.index.num_shards, self.index.strategy
+            
+            header = write_snapshot(path, vectors, chunk_store, self.config.EMBEDDING_MODEL,
+                                    compression=compression, num_shards=num_shards, shard_strategy=strategy)
+            
+            return {
+                "success": True,
+                "message": f"Exported {header['count']} chunks to snapshot",
+                "chunks_count": header['count'],
+                "size_bytes": os.path.getsize(path)
+            }
+            
+        except Exception as e:
+            return {"success": False, "message": f"Error exporting snapshot: {str(e)}"}
+    
+    def import_snapshot(self, path: str, move: bool = False) -> Dict:
+        """Replace the knowledge base with the contents of a snapshot file.
+        
+        The snapshot is fully read and verified before anything is replaced.
+        Its chunks are spread over this index's current shard count and
+        strategy. An uncompressed snapshot with that same shard layout becomes
+        the on-disk store as it is, moved there with `move` or copied
+        otherwise, instead of being written out again. A failed result has
+        `invalid` set when the snapshot itself is malformed or was built for
+        another embedding model, as opposed to an error on this side.
+        """
+        try:
+            snapshot = read_snapshot(path)
+            header = snapshot['header']
+            self._check_compatible(header)
+            
+            # Build the replacement outside the locks, then swap it in
+            chunk_store = snapshot['store']
+            index = ShardedIndex(self.dimension, num_shards=self.index.num_shards,
+                                 strategy=self.index.strategy, max_workers=self.index.max_workers)
+            assignment = self._shard_assignment(chunk_store, index)
+            index.assign(snapshot['vectors'], assignment)
+            adopt = (header.get('num_shards') == index.num_shards
+                     and header.get('shard_strategy') == index.strategy
+                     and np.array_equal(assignment, chunk_store.shard)
+                     and all(section['compression'] == 'none' for section in header['sections']))
+            chunk_store = chunk_store.with_shards(assignment)
+            # Unmaps the file, which must happen before it is moved
+            del snapshot
+            
+            with self._save_lock:
+                with self._mutation_lock, self._lock.write():
+                    old_index = self.index
+                    self.index = index
+                    self.chunks = chunk_store
+                    self._generation += 1
+                    generation = self._generation
+                old_index.close()
+                
+                if adopt:
+                    try:
+                        self._install_store_file(path, move)
+                        self._saved_generation = generation
+                    except OSError as e:
+                        print(f"Error adopting snapshot as the store: {e}")
+            
+            # Writes the store only if the snapshot could not be adopted
+            self.save_index()
+            
+            return {
+                "success": True,
+                "message": f"Imported {header['count']} chunks from {len(chunk_store.documents)} documents",
+                "chunks_count": header['count'],
+                "documents_count": len(chunk_store.documents)
+            }
+            
+        except SnapshotError as e:
+            return {"success": False, "message": f"Invalid snapshot: {str(e)}", "invalid": True}
+        except Exception as e:
+            return {"success": False, "message": f"Error importing snapshot: {str(e)}", "invalid": False}
+    
+    def _install_store_file(self, path: str, move: bool):
+        """Make a verified snapshot file the on-disk store."""
+        if move:
+            os.replace(path, self.store_path)
+            return
+        tmp_path = f"{self.store_path}.tmp"
+        try:
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, self.store_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    @staticmethod
+    def _shard_assignment(chunk_store: ChunkStore, index: ShardedIndex) -> np.ndarray:
+        """Shard number of every chunk, routing documents without a valid stored shard."""
+        shard = chunk_store.shard.astype('int64')
+        invalid = (shard < 0) | (shard >= index.num_shards)
+        if invalid.any():
+            # A document stays with its chunks that already have a valid shard
+            doc_shard = np.full(len(chunk_store.documents), -1, dtype='int64')
+            doc_shard[chunk_store.document[~invalid]] = shard[~invalid]
+            for code in np.unique(chunk_store.document[invalid]):
+                if doc_shard[code] < 0:
+                    doc_shard[code] = index.route(chunk_store.documents[code][0])
+            shard[invalid] = doc_shard[chunk_store.document[invalid]]
+        return shard
+    
+    def rebalance_shards(self, num_shards: int = None, strategy: str = None) -> Dict:
+        """Redistribute stored vectors across shards, optionally changing shard count or strategy."""
+        try:
+            with self._mutation_lock:
+                # No other update can run, so the new shards are built while searches use the old ones
+                index, assignment = self.index.rebalanced(self.chunks.document_ids(),
+                                                          num_shards=num_shards, strategy=strategy)
+                chunk_store = self.chunks.with_shards(assignment)
+                
+                with self._lock.write():
+                    old_index = self.index
+                    self.index = index
+                    self.chunks = chunk_store
+                    self._generation += 1
+            old_index.close()
+            self.save_index()
+            
+            return {
+                "success": True,
+                "message": f"Rebalanced index across {index.num_shards} shard(s)",
+                "strategy": index.strategy,
+                "shard_sizes": index.shard_sizes()
+            }
+            
+        except Exception as e:
+            return {"success": False, "message": f"Error rebalancing shards: {str(e)}"}
+    
     def get_stats(self) -> Dict:
         """Get statistics about the knowledge base."""
-        documents = set(chunk['document_id'] for chunk in self.chunks)
-        
-        return {
-            'total_chunks': len(self.chunks),
-            'total_documents': len(documents),
-            'documents': list(documents),
-            'index_size': self.index.ntotal
-        }
+        with self._lock.read():
+            documents = [document_id for document_id, _ in self.chunks.documents]
+            
+            return {
+                'total_chunks': len(self.chunks),
+                'total_documents': len(documents),
+                'documents': documents,
+                'index_size': self.index.ntotal,
+                'shard_sizes': self.index.shard_sizes()
+            }
@@ -0,0 +1,229 @@
+import hashlib
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import faiss
+
+class ShardedIndex:
+    """Inner-product vector index split across several FAISS shards.
+
+    Vectors keep a global position (the same position used for the chunk
+    lists in RAGSystem), while each shard stores only its own vectors plus
+    the global positions they belong to. Searches fan out to every shard
+    in parallel and the partial results are merged with a heap-based top-k.
+    """
+
+    STRATEGIES = ("hash", "size")
+
+    def __init__(self, dimension: int, num_shards: int = 1, strategy: str = "hash",
+                 max_workers: Optional[int] = None):
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1")
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown sharding strategy: {strategy}")
+
+        self.dimension = dimension
+        self.num_shards = num_shards
+        self.strategy = strategy
+        self.max_workers = max_workers
+
+        self._init_shards()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _init_shards(self):
+        """Create empty shards and reset the global position map."""
+        self.shards = [faiss.IndexFlatIP(self.dimension) for _ in range(self.num_shards)]
+        # Global position of every vector stored in each shard, in shard order
+        self.shard_ids = [np.empty(0, dtype='int64') for _ in range(self.num_shards)]
+        # Shard and local row of every global position
+        self._shard_of = np.empty(0, dtype='int64')
+        self._local_of = np.empty(0, dtype='int64')
+
+    @property
+    def ntotal(self) -> int:
+        return int(self._shard_of.shape[0])
+
+    def shard_sizes(self) -> List[int]:
+        return [int(shard.ntotal) for shard in self.shards]
+
+    def route(self, document_id: str) -> int:
+        """Pick the shard a new document should be stored in."""
+        if self.num_shards == 1:
+            return 0
+        if self.strategy == "size":
+            sizes = self.shard_sizes()
+            return sizes.index(min(sizes))
+        digest = hashlib.md5(document_id.encode('utf-8')).digest()
+        return int.from_bytes(digest[:8], 'little') % self.num_shards
+
+    def add(self, embeddings: np.ndarray, shard: int):
+        """Append vectors to one shard; they take the next global positions."""
+        embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+        count = embeddings.shape[0]
+        start = self.ntotal
+        local_start = self.shards[shard].ntotal
+
+        self.shards[shard].add(embeddings)
+        global_ids = np.arange(start, start + count, dtype='int64')
+        self.shard_ids[shard] = np.concatenate([self.shard_ids[shard], global_ids])
+        self._shard_of = np.concatenate([self._shard_of, np.full(count, shard, dtype='int64')])
+        self._local_of = np.concatenate([
+            self._local_of, np.arange(local_start, local_start + count, dtype='int64')
+        ])
+
+    def remove(self, global_ids: np.ndarray):
+        """Delete vectors by global position; later positions shift down to stay contiguous."""
+        global_ids = np.unique(np.asarray(global_ids, dtype='int64'))
+        if global_ids.shape[0] == 0:
+            return
+
+        for shard in range(self.num_shards):
+            ids = self.shard_ids[shard]
+            doomed = np.isin(ids, global_ids)
+            if doomed.any():
+                # Flat indexes compact in place, preserving the order of remaining rows
+                self.shards[shard].remove_ids(np.flatnonzero(doomed).astype('int64'))
+                ids = ids[~doomed]
+            self.shard_ids[shard] = ids - np.searchsorted(global_ids, ids)
+
+        keep = np.ones(self.ntotal, dtype=bool)
+        keep[global_ids] = False
+        self._shard_of = self._shard_of[keep]
+        self._local_of = np.empty(self._shard_of.shape[0], dtype='int64')
+        for shard in range(self.num_shards):
+            self._local_of[self.shard_ids[shard]] = np.arange(self.shard_ids[shard].shape[0], dtype='int64')
+
+    def reconstruct(self, global_ids: np.ndarray) -> np.ndarray:
+        """Return the stored vectors for the given global positions."""
+        global_ids = np.asarray(global_ids, dtype='int64')
+        vectors = np.empty((global_ids.shape[0], self.dimension), dtype='float32')
+        for shard in range(self.num_shards):
+            mask = self._shard_of[global_ids] == shard
+            if mask.any():
+                local = self._local_of[global_ids[mask]]
+                vectors[mask] = self.shards[shard].reconstruct_batch(local)
+        return vectors
+
+    def reconstruct_all(self) -> np.ndarray:
+        """Return every stored vector in global order."""
+        vectors = np.empty((self.ntotal, self.dimension), dtype='float32')
+        for shard, index in enumerate(self.shards):
+            if index.ntotal:
+                vectors[self.shard_ids[shard]] = index.reconstruct_n(0, index.ntotal)
+        return vectors
+
+    def assign(self, vectors: np.ndarray, shard_assignment: np.ndarray):
+        """Rebuild all shards from vectors in global order and their shard numbers."""
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+        shard_assignment = np.asarray(shard_assignment, dtype='int64')
+
+        self._init_shards()
+        self._shard_of = shard_assignment.copy()
+        self._local_of = np.empty(shard_assignment.shape[0], dtype='int64')
+        for shard in range(self.num_shards):
+            global_ids = np.flatnonzero(shard_assignment == shard).astype('int64')
+            if global_ids.shape[0] and global_ids[-1] - global_ids[0] + 1 == global_ids.shape[0]:
+                # A contiguous run is added from a slice, without gathering a copy first
+                self.shards[shard].add(vectors[global_ids[0]:global_ids[-1] + 1])
+            elif global_ids.shape[0]:
+                self.shards[shard].add(vectors[global_ids])
+            self.shard_ids[shard] = global_ids
+            self._local_of[global_ids] = np.arange(global_ids.shape[0], dtype='int64')
+
+    def rebalanced(self, document_ids: List[str], num_shards: Optional[int] = None,
+                   strategy: Optional[str] = None) -> Tuple["ShardedIndex", np.ndarray]:
+        """Build a copy of this index with its vectors redistributed, without re-encoding.
+
+        `document_ids` gives the owning document of every global position, so
+        that a document's chunks always stay together on one shard. This index
+        is left untouched and can keep serving searches while the copy is
+        built. Returns the new index and the shard number of every position.
+        """
+        index = ShardedIndex(
+            self.dimension,
+            num_shards=self.num_shards if num_shards is None else num_shards,
+            strategy=strategy or self.strategy,
+            max_workers=self.max_workers
+        )
+
+        doc_sizes: Dict[str, int] = {}
+        for document_id in document_ids:
+            doc_sizes[document_id] = doc_sizes.get(document_id, 0) + 1
+
+        doc_shard: Dict[str, int] = {}
+        if index.strategy == "size":
+            # Greedy largest-first packing keeps shard sizes close to even
+            loads = [(0, shard) for shard in range(index.num_shards)]
+            heapq.heapify(loads)
+            for document_id, size in sorted(doc_sizes.items(), key=lambda item: -item[1]):
+                load, shard = heapq.heappop(loads)
+                doc_shard[document_id] = shard
+                heapq.heappush(loads, (load + size, shard))
+        else:
+            for document_id in doc_sizes:
+                doc_shard[document_id] = index.route(document_id)
+
+        assignment = np.array([doc_shard[document_id] for document_id in document_ids], dtype='int64')
+        index.assign(self.reconstruct_all(), assignment)
+        return index, assignment
+
+    def _search_shard(self, shard: int, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        index = self.shards[shard]
+        scores, local = index.search(queries, min(k, index.ntotal))
+        global_ids = np.where(local >= 0, self.shard_ids[shard][np.maximum(local, 0)], -1)
+        return scores, global_ids
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Search all shards and merge into a FAISS-style (scores, ids) pair.
+
+        Missing results are padded with a score of -inf and an id of -1.
+        """
+        queries = np.ascontiguousarray(queries, dtype='float32')
+        num_queries = queries.shape[0]
+        k = max(k, 0)
+        scores = np.full((num_queries, k), -np.inf, dtype='float32')
+        ids = np.full((num_queries, k), -1, dtype='int64')
+
+        active = [shard for shard in range(self.num_shards) if self.shards[shard].ntotal > 0]
+        if not active or k <= 0:
+            return scores, ids
+
+        if len(active) == 1:
+            partials = [self._search_shard(active[0], queries, k)]
+        else:
+            # FAISS releases the GIL while scanning, so shards search concurrently
+            executor = self._get_executor()
+            partials = list(executor.map(lambda shard: self._search_shard(shard, queries, k), active))
+
+        for q in range(num_queries):
+            candidates = (
+                (float(shard_scores[q, j]), int(shard_ids[q, j]))
+                for shard_scores, shard_ids in partials
+                for j in range(shard_ids.shape[1])
+                if shard_ids[q, j] >= 0
+            )
+            for rank, (score, global_id) in enumerate(heapq.nlargest(k, candidates)):
+                scores[q, rank] = score
+                ids[q, rank] = global_id
+
+        return scores, ids
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Concurrent searches share the pool, so only one of them may create it
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=min(self.max_workers or self.num_shards, self.num_shards),
+                    thread_name_prefix="shard-search"
+                )
+            return self._executor
+
+    def close(self):
+        """Shut down the search thread pool."""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
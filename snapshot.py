@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Portable single-file snapshots of the knowledge base
+"""
+
+import os
+import json
+import codecs
+import mmap
+import time
+import zlib
+import struct
+import argparse
+from typing import BinaryIO, Dict, Optional, Tuple
+import numpy as np
+
+from chunk_store import ChunkStore
+from sharded_index import ShardedIndex
+
+MAGIC = b"KBSNAP\r\n"
+FORMAT_VERSION = 2
+COMPRESSIONS = ("none", "zlib")
+SECTIONS = ("documents", "columns", "text", "vectors")
+BLOCK_SIZE = 1024 * 1024
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot file is malformed, corrupted or incompatible."""
+
+# File layout:
+#   MAGIC | uint32 header length (little-endian) | header JSON | documents | columns | text | vectors
+# The header lists every section in file order with its stored size, its
+# uncompressed size and the CRC-32 of its uncompressed bytes. The sections
+# mirror ChunkStore: documents is the JSON list of [document_id, path],
+# columns holds the int32 document, chunk_index, length and shard columns
+# followed by the count + 1 int64 text byte offsets, text is all chunk text
+# as UTF-8, and vectors are float32. All numbers are little-endian, so the
+# columns and vectors load straight into NumPy arrays. Every section but the
+# vectors may be zlib-compressed; vectors are left raw since they barely
+# compress.
+#
+# The header also records the shard count and strategy of the index the
+# snapshot was taken from. The knowledge base keeps itself on disk in this
+# format (uncompressed) and restores its shard layout from it, so an
+# imported snapshot can be adopted as the store without rewriting it.
+
+def _encode_columns(store: ChunkStore) -> bytes:
+    return b"".join(
+        np.ascontiguousarray(column, dtype=dtype).tobytes()
+        for column, dtype in ((store.document, '<i4'), (store.chunk_index, '<i4'), (store.length, '<i4'),
+                              (store.shard, '<i4'), (store.text_offsets, '<i8'))
+    )
+
+def _decode_store(document_bytes: bytes, column_bytes: bytes, text: bytes, count: int) -> ChunkStore:
+    try:
+        entries = json.loads(document_bytes)
+    except ValueError:
+        raise SnapshotError("Snapshot documents are corrupted")
+    if not isinstance(entries, list) or not all(
+            isinstance(entry, list) and len(entry) == 2
+            and isinstance(entry[0], str) and isinstance(entry[1], str) for entry in entries):
+        raise SnapshotError("Snapshot documents must be [document_id, path] string pairs")
+    documents = [tuple(entry) for entry in entries]
+    if len({document_id for document_id, _ in documents}) != len(documents):
+        raise SnapshotError("Snapshot lists a document more than once")
+    if len(column_bytes) != 16 * count + 8 * (count + 1):
+        raise SnapshotError("Snapshot columns do not match its vectors")
+
+    document, chunk_index, length, shard = np.frombuffer(column_bytes, dtype='<i4', count=4 * count).reshape(4, count)
+    text_offsets = np.frombuffer(column_bytes, dtype='<i8', offset=16 * count)
+
+    if count and (document.min() < 0 or document.max() >= len(documents)):
+        raise SnapshotError("Snapshot rows refer to unknown documents")
+    if text_offsets[0] != 0 or text_offsets[-1] != len(text) or (np.diff(text_offsets) < 0).any():
+        raise SnapshotError("Snapshot text offsets are corrupted")
+    # Chunks are decoded one at a time when read, so the whole buffer must be
+    # valid UTF-8 and every chunk must start on a character boundary. ASCII
+    # text, the common case, passes both checks without being decoded.
+    if not text.isascii():
+        try:
+            codecs.utf_8_decode(text, 'strict', True)
+        except UnicodeDecodeError:
+            raise SnapshotError("Snapshot text is not valid UTF-8")
+        starts = text_offsets[:-1][text_offsets[:-1] < len(text)]
+        if ((np.frombuffer(text, dtype=np.uint8)[starts] & 0xC0) == 0x80).any():
+            raise SnapshotError("Snapshot text offsets split a character")
+
+    try:
+        return ChunkStore(documents, document, chunk_index, length, shard, text, text_offsets)
+    except (TypeError, ValueError) as e:
+        raise SnapshotError(f"Snapshot chunks are malformed: {e}")
+
+def _section(name: str, data, compression: str) -> Tuple[Dict, bytes]:
+    stored = zlib.compress(data, 1) if compression == "zlib" else data
+    return {
+        'name': name,
+        'compression': compression,
+        'size': len(data),
+        'stored_size': len(stored),
+        'crc32': zlib.crc32(data)
+    }, stored
+
+def write_snapshot(path: str, vectors: np.ndarray, store: ChunkStore, embedding_model: str,
+                   compression: str = "none", num_shards: Optional[int] = None,
+                   shard_strategy: Optional[str] = None) -> Dict:
+    """Write vectors and their chunk store to a single snapshot file and return its header."""
+    if compression not in COMPRESSIONS:
+        raise SnapshotError(f"Unknown compression: {compression}")
+    if len(store) != vectors.shape[0]:
+        raise SnapshotError("Vectors and chunks are out of sync")
+
+    # Byte view of the vectors, so they are written without another copy
+    vector_bytes = memoryview(np.ascontiguousarray(vectors, dtype='<f4').reshape(-1).view(np.uint8))
+    document_bytes = json.dumps([list(entry) for entry in store.documents], separators=(',', ':')).encode('utf-8')
+
+    sections = [
+        _section('documents', document_bytes, compression),
+        _section('columns', _encode_columns(store), compression),
+        _section('text', memoryview(store.text), compression),
+        _section('vectors', vector_bytes, 'none')
+    ]
+    header = {
+        'format_version': FORMAT_VERSION,
+        'created': time.time(),
+        'embedding_model': embedding_model,
+        'dimension': int(vectors.shape[1]),
+        'count': int(vectors.shape[0]),
+        'sections': [section for section, _ in sections]
+    }
+    if num_shards is not None:
+        header['num_shards'] = num_shards
+        header['shard_strategy'] = shard_strategy
+    header_bytes = json.dumps(header).encode('utf-8')
+
+    # Write beside the target and rename, so a failed write never leaves a partial file
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<I', len(header_bytes)))
+            f.write(header_bytes)
+            for _, stored in sections:
+                view = memoryview(stored)
+                for start in range(0, len(view), BLOCK_SIZE):
+                    f.write(view[start:start + BLOCK_SIZE])
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return header
+
+def _read_exact(f: BinaryIO, view: memoryview):
+    filled = 0
+    while filled < len(view):
+        read = f.readinto(view[filled:])
+        if not read:
+            raise SnapshotError("Snapshot is truncated")
+        filled += read
+
+def _read_section(f: BinaryIO, section: Dict, out: memoryview):
+    """Read one section into `out`, decompressing as it streams, and verify its checksum."""
+    if len(out) != section['size']:
+        raise SnapshotError(f"Section {section['name']} has an unexpected size")
+
+    if section['compression'] == 'none':
+        _read_exact(f, out)
+    elif section['compression'] == 'zlib':
+        decompressor = zlib.decompressobj()
+        remaining = section['stored_size']
+        filled = 0
+        while remaining > 0:
+            data = f.read(min(BLOCK_SIZE, remaining))
+            if not data:
+                raise SnapshotError("Snapshot is truncated")
+            remaining -= len(data)
+            while data:
+                try:
+                    # Output is capped to the space left; a max_length of 0 would mean unlimited
+                    decompressed = decompressor.decompress(data, max(len(out) - filled, 1))
+                except zlib.error as e:
+                    raise SnapshotError(f"Section {section['name']} is corrupted: {e}")
+                if filled + len(decompressed) > len(out):
+                    raise SnapshotError(f"Section {section['name']} is larger than its header states")
+                out[filled:filled + len(decompressed)] = decompressed
+                filled += len(decompressed)
+                data = decompressor.unconsumed_tail
+        if filled != len(out) or not decompressor.eof:
+            raise SnapshotError(f"Section {section['name']} is incomplete")
+    else:
+        raise SnapshotError(f"Unknown compression: {section['compression']}")
+
+    if zlib.crc32(out) != section['crc32']:
+        raise SnapshotError(f"Checksum mismatch in section {section['name']}")
+
+def read_header(f: BinaryIO) -> Dict:
+    """Read and validate the snapshot header from an open file."""
+    if f.read(len(MAGIC)) != MAGIC:
+        raise SnapshotError("Not a knowledge base snapshot")
+
+    length_bytes = f.read(4)
+    if len(length_bytes) != 4:
+        raise SnapshotError("Snapshot is truncated")
+    (header_length,) = struct.unpack('<I', length_bytes)
+
+    try:
+        header = json.loads(f.read(header_length))
+    except ValueError:
+        raise SnapshotError("Snapshot header is corrupted")
+
+    if header.get('format_version') != FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version: {header.get('format_version')}")
+    if tuple(section.get('name') for section in header.get('sections', [])) != SECTIONS:
+        raise SnapshotError("Snapshot sections are not recognised")
+    if 'num_shards' in header and not (
+            type(header['num_shards']) is int and header['num_shards'] >= 1
+            and header.get('shard_strategy') in ShardedIndex.STRATEGIES):
+        raise SnapshotError("Snapshot shard layout is not recognised")
+    return header
+
+def _map_vectors(f: BinaryIO, header: Dict) -> np.ndarray:
+    """Verify uncompressed vectors in place and return a read-only view of them in the file."""
+    section = header['sections'][3]
+    offset = f.tell()
+    if os.fstat(f.fileno()).st_size < offset + section['stored_size']:
+        raise SnapshotError("Snapshot is truncated")
+    if section['size'] == 0:
+        return np.empty((0, header['dimension']), dtype='float32')
+
+    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)[offset:offset + section['size']]
+    if zlib.crc32(view) != section['crc32']:
+        view.release()
+        mapped.close()
+        raise SnapshotError(f"Checksum mismatch in section {section['name']}")
+    view.release()
+
+    # The array keeps the mapping open until it is released
+    vectors = np.frombuffer(mapped, dtype='<f4', count=header['count'] * header['dimension'], offset=offset)
+    return vectors.reshape(header['count'], header['dimension'])
+
+def read_snapshot(path: str) -> Dict:
+    """Read and verify a snapshot, returning its header, vectors and chunk store.
+
+    Uncompressed vectors are checksummed and returned straight from a
+    read-only memory map of the file rather than copied, so loading them
+    into an index is the only copy made. Release the vectors once they are
+    loaded; until then the file stays mapped.
+    """
+    with open(path, 'rb') as f:
+        header = read_header(f)
+        document_section, column_section, text_section, vector_section = header['sections']
+        count, dimension = header['count'], header['dimension']
+        if vector_section['size'] != count * dimension * 4:
+            raise SnapshotError("Section vectors has an unexpected size")
+
+        buffers = []
+        for section in (document_section, column_section, text_section):
+            buffer = bytearray(section['size'])
+            _read_section(f, section, memoryview(buffer))
+            buffers.append(buffer)
+        store = _decode_store(*buffers, count)
+
+        if vector_section['compression'] == 'none':
+            vectors = _map_vectors(f, header)
+        else:
+            vectors = np.empty((count, dimension), dtype='<f4')
+            _read_section(f, vector_section, memoryview(vectors.reshape(-1).view(np.uint8)))
+
+    return {
+        'header': header,
+        'vectors': vectors,
+        'store': store
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Export, import or verify knowledge base snapshots.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Write the current knowledge base to a snapshot")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--compression", choices=COMPRESSIONS, default="none",
+                               help="Compression for chunk text and metadata")
+
+    import_parser = subparsers.add_parser("import", help="Replace the knowledge base with a snapshot")
+    import_parser.add_argument("path")
+
+    verify_parser = subparsers.add_parser("verify", help="Check a snapshot's checksums")
+    verify_parser.add_argument("path")
+
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        try:
+            snapshot = read_snapshot(args.path)
+        except (OSError, SnapshotError) as e:
+            print(f"Invalid snapshot: {e}")
+            raise SystemExit(1)
+        header = snapshot['header']
+        print(f"Snapshot OK: {header['count']} chunks, dimension {header['dimension']}, "
+              f"model {header['embedding_model']}")
+        return
+
+    from rag_system import RAGSystem
+    rag_system = RAGSystem()
+
+    if args.command == "export":
+        result = rag_system.export_snapshot(args.path, compression=args.compression)
+    else:
+        result = rag_system.import_snapshot(args.path)
+
+    print(result["message"])
+    if not result["success"]:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from admission import Deadline, DeadlineExceeded, QueueFull, ReadWriteLock, WorkQueue
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_run_passes_deadline_to_job():
+    queue = WorkQueue("test", max_workers=1, max_queued=1)
+    deadline = Deadline(5)
+
+    def job(value, deadline=None):
+        return value, deadline
+
+    try:
+        assert run(queue.run(job, "x", deadline=deadline)) == ("x", deadline)
+    finally:
+        queue.shutdown()
+
+def test_run_can_withhold_deadline():
+    queue = WorkQueue("test", max_workers=1, max_queued=1)
+
+    def job(value):
+        return value
+
+    try:
+        assert run(queue.run(job, "x", deadline=Deadline(5), pass_deadline=False)) == "x"
+    finally:
+        queue.shutdown()
+
+def test_run_rejects_when_full():
+    queue = WorkQueue("test", max_workers=1, max_queued=0, retry_after=7)
+    release = threading.Event()
+
+    async def scenario():
+        first = asyncio.ensure_future(
+            queue.run(release.wait, deadline=Deadline(5), pass_deadline=False)
+        )
+        await asyncio.sleep(0.05)
+        with pytest.raises(QueueFull) as excinfo:
+            await queue.run(lambda: None, deadline=Deadline(5), pass_deadline=False)
+        release.set()
+        await first
+        return excinfo.value
+
+    try:
+        error = run(scenario())
+        assert error.retry_after == 7
+        assert queue.rejected == 1
+        assert queue.pending == 0
+    finally:
+        release.set()
+        queue.shutdown()
+
+def test_run_fails_when_deadline_passes():
+    queue = WorkQueue("test", max_workers=1, max_queued=1)
+    release = threading.Event()
+
+    try:
+        with pytest.raises(DeadlineExceeded):
+            run(queue.run(release.wait, deadline=Deadline(0.05), pass_deadline=False))
+    finally:
+        release.set()
+        queue.shutdown()
+
+def test_yielding_queue_waits_for_priority_queue():
+    search = WorkQueue("search", max_workers=1, max_queued=1)
+    ingest = WorkQueue("ingest", max_workers=1, max_queued=1, yield_to=search)
+    release = threading.Event()
+    order = []
+
+    def search_job():
+        release.wait()
+        order.append("search")
+
+    async def scenario():
+        searching = asyncio.ensure_future(
+            search.run(search_job, deadline=Deadline(5), pass_deadline=False)
+        )
+        await asyncio.sleep(0.05)
+        ingesting = asyncio.ensure_future(
+            ingest.run(order.append, "ingest", deadline=Deadline(5), pass_deadline=False)
+        )
+        await asyncio.sleep(0.05)
+        assert order == []
+        release.set()
+        await asyncio.gather(searching, ingesting)
+
+    try:
+        run(scenario())
+        assert order == ["search", "ingest"]
+    finally:
+        release.set()
+        search.shutdown()
+        ingest.shutdown()
+
+def test_read_write_lock_shares_reads_and_excludes_writes():
+    lock = ReadWriteLock()
+    both_reading = threading.Barrier(2, timeout=5)
+    events = []
+
+    def reader(name):
+        with lock.read():
+            both_reading.wait()
+            events.append(name)
+
+    def writer():
+        with lock.write():
+            events.append("write")
+
+    with lock.read():
+        readers = [threading.Thread(target=reader, args=(name,)) for name in ("a", "b")]
+        for thread in readers:
+            thread.start()
+        for thread in readers:
+            thread.join(timeout=5)
+        writing = threading.Thread(target=writer)
+        writing.start()
+        writing.join(timeout=0.1)
+        # The writer waits for the outer reader to leave
+        assert writing.is_alive()
+    writing.join(timeout=5)
+
+    assert sorted(events[:2]) == ["a", "b"]
+    assert events[2] == "write"
+
+def test_waiting_writer_blocks_new_readers():
+    lock = ReadWriteLock()
+    events = []
+
+    def writer():
+        with lock.write():
+            events.append("write")
+
+    def reader():
+        with lock.read():
+            events.append("read")
+
+    with lock.read():
+        writing = threading.Thread(target=writer)
+        writing.start()
+        time.sleep(0.05)
+        reading = threading.Thread(target=reader)
+        reading.start()
+        reading.join(timeout=0.1)
+        assert events == []
+    writing.join(timeout=5)
+    reading.join(timeout=5)
+
+    assert events == ["write", "read"]
@@ -0,0 +1,204 @@
+import sys
+import time
+import asyncio
+import threading
+import types
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient
+
+from admission import Deadline, QueueFull
+from config import Config
+from watcher import DirectoryWatcher
+
+class FakeRAGSystem:
+    """Stands in for the embedding model and index, recording what the API passes in."""
+
+    def __init__(self):
+        self.calls = []
+
+    def add_document(self, file_path, document_id=None, deadline=None, replace=False, save=True):
+        self.calls.append(('add_document', deadline))
+        return {
+            "success": True,
+            "message": f"Document {file_path} added",
+            "document_id": "notes",
+            "chunks_count": 1
+        }
+
+    def retrieve(self, query, top_k=5, deadline=None, diversity=None, neighbors=0):
+        self.calls.append(('retrieve', deadline))
+        return {
+            'results': [{'document_id': "notes", 'text': "Deadlines propagate.", 'score': 0.9}],
+            'diversity_ms': None
+        }
+
+    def remove_document(self, document_id, save=True):
+        self.calls.append(('remove_document', threading.current_thread().name))
+        if document_id != "notes":
+            return {"success": False, "message": f"Document not found: {document_id}"}
+        return {"success": True, "message": "Removed", "document_id": document_id, "chunks_count": 1}
+
+    def rebalance_shards(self, num_shards=None, strategy=None):
+        self.calls.append(('rebalance_shards', threading.current_thread().name))
+        return {"success": True, "message": "Rebalanced", "strategy": strategy, "shard_sizes": [1]}
+
+    def import_snapshot(self, path, move=False):
+        with open(path, 'rb') as f:
+            content = f.read()
+        if content == b"corrupt":
+            return {"success": False, "message": "Invalid snapshot: bad checksum", "invalid": True}
+        return {"success": False, "message": "Error importing snapshot: disk full", "invalid": False}
+
+    def build_context(self, chunks):
+        return "\n".join(chunk['text'] for chunk in chunks)
+
+class SlowWatchedRAGSystem:
+    """Indexes watched files slowly, so the watcher is mid-job when the app stops."""
+
+    def __init__(self):
+        self.documents = {}
+        self.started = threading.Event()
+
+    def indexed_documents(self):
+        return dict(self.documents)
+
+    def add_document(self, file_path, document_id=None, deadline=None, replace=False, save=True):
+        self.started.set()
+        time.sleep(0.5)
+        self.documents[document_id] = file_path
+        return {"success": True, "message": "added", "document_id": document_id, "chunks_count": 1}
+
+    def save_index(self):
+        return True
+
+class FakeLLMClient:
+    def __init__(self):
+        self.calls = []
+
+    def generate_answer(self, query, context, deadline=None):
+        self.calls.append(('generate_answer', deadline))
+        return {"success": True, "answer": "They do."}
+
+@pytest.fixture(scope="module")
+def main_module():
+    fakes = {
+        'rag_system': types.SimpleNamespace(RAGSystem=FakeRAGSystem),
+        'llm_client': types.SimpleNamespace(GroqLLMClient=FakeLLMClient)
+    }
+    saved = {name: sys.modules.get(name) for name in (*fakes, 'main')}
+    sys.modules.update(fakes)
+    sys.modules.pop('main', None)
+    try:
+        import main
+        yield main
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+@pytest.fixture
+def client(main_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(main_module.config, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(main_module.config, "VECTOR_DB_PATH", str(tmp_path))
+    main_module.rag_system.calls.clear()
+    main_module.llm_client.calls.clear()
+    with TestClient(main_module.app) as test_client:
+        yield test_client
+
+def test_upload_runs_on_ingest_queue_with_deadline(client, main_module, tmp_path):
+    response = client.post("/upload", files={"file": ("notes.txt", b"Deadlines propagate.", "text/plain")})
+
+    assert response.status_code == 200
+    assert response.json()["document_id"] == "notes"
+    assert (tmp_path / "notes.txt").read_bytes() == b"Deadlines propagate."
+    [(name, deadline)] = main_module.rag_system.calls
+    assert name == 'add_document'
+    assert isinstance(deadline, Deadline)
+    assert main_module.ingest_queue.pending == 0
+
+def test_query_runs_on_search_and_llm_queues_with_one_deadline(client, main_module):
+    response = client.post("/query", json={"query": "Do deadlines propagate?"},
+                           headers={"X-Request-Timeout": "5"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["success"] is True
+    assert body["answer"] == "They do."
+    [(_, search_deadline)] = main_module.rag_system.calls
+    [(_, llm_deadline)] = main_module.llm_client.calls
+    assert isinstance(search_deadline, Deadline)
+    assert search_deadline is llm_deadline
+    assert search_deadline.timeout == 5
+
+def test_rebalance_runs_on_ingest_workers(client, main_module):
+    response = client.post("/shards/rebalance", json={"strategy": "size"})
+
+    assert response.status_code == 200
+    [(name, thread_name)] = main_module.rag_system.calls
+    assert name == 'rebalance_shards'
+    assert thread_name.startswith("ingest-worker")
+
+def test_delete_runs_on_ingest_workers(client, main_module):
+    assert client.delete("/documents/notes").status_code == 200
+    assert client.delete("/documents/missing").status_code == 404
+    assert [thread_name.startswith("ingest-worker")
+            for _, thread_name in main_module.rag_system.calls] == [True, True]
+
+@pytest.mark.parametrize("content, status_code", [(b"corrupt", 400), (b"valid", 500)])
+def test_snapshot_import_status_codes(client, content, status_code):
+    response = client.post("/snapshot/import", files={"file": ("kb.kbsnap", content, "application/octet-stream")})
+
+    assert response.status_code == status_code
+
+def test_shutdown_lets_the_watcher_finish_its_queued_job(main_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "VECTOR_DB_PATH", str(tmp_path))
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / "notes.txt").write_text("Deadlines propagate.")
+    rag_system = SlowWatchedRAGSystem()
+    watcher = DirectoryWatcher(rag_system, directory=str(tmp_path / "docs"), interval=0.05, debounce=0)
+    monkeypatch.setattr(main_module, "directory_watcher", watcher)
+
+    async def start_and_stop():
+        await main_module.start_watcher()
+        await asyncio.to_thread(rag_system.started.wait, 5)
+        started = time.monotonic()
+        await main_module.stop_watcher()
+        return time.monotonic() - started
+
+    # Joining the watcher on the event loop would stall until the join timed out
+    assert asyncio.run(start_and_stop()) < 2
+    assert list(watcher.files) == ["notes.txt"]
+
+def test_watcher_stops_waiting_for_a_full_queue_once_stopped(main_module, tmp_path, monkeypatch):
+    class FullQueue:
+        async def run(self, fn, *args, **kwargs):
+            raise QueueFull("ingest", 30)
+
+    monkeypatch.setattr(Config, "VECTOR_DB_PATH", str(tmp_path))
+    monkeypatch.setattr(main_module, "ingest_queue", FullQueue())
+    watcher = DirectoryWatcher(SlowWatchedRAGSystem(), directory=str(tmp_path))
+
+    async def run_job_then_stop():
+        run_job = main_module.ingest_queue_runner(asyncio.get_running_loop(), watcher)
+        job = asyncio.ensure_future(asyncio.to_thread(run_job, print))
+        await asyncio.sleep(0.1)
+        watcher.stop()
+        await asyncio.wait_for(job, 2)
+
+    with pytest.raises(QueueFull):
+        asyncio.run(run_job_then_stop())
+
+@pytest.mark.parametrize("top_k, status_code", [(0, 422), (5, 200), (25000, 422)])
+def test_search_bounds_top_k(client, top_k, status_code):
+    assert client.get("/search", params={"query": "deadlines", "top_k": top_k}).status_code == status_code
+
+def test_query_bounds_max_chunks(client):
+    response = client.post("/query", json={"query": "Do deadlines propagate?", "max_chunks": 25000})
+
+    assert response.status_code == 422
@@ -0,0 +1,60 @@
+import numpy as np
+
+from chunk_store import ChunkStore
+
+def make_chunks(document_id, count, path=None):
+    return [
+        {
+            'id': f"{document_id}_chunk_{i}",
+            'document_id': document_id,
+            'document_path': path or f"uploads/{document_id}.txt",
+            'chunk_index': i,
+            'text': f"{document_id} chunk {i} – ünïcode",
+            'length': 20 + i
+        }
+        for i in range(count)
+    ]
+
+def test_rows_read_back_as_chunk_dicts():
+    chunks = make_chunks("a", 3) + make_chunks("b", 2)
+    store = ChunkStore().append(chunks[:3], 0).append(chunks[3:], 1)
+
+    assert len(store) == 5
+    assert list(store) == chunks
+    assert store.shard.tolist() == [0, 0, 0, 1, 1]
+    assert store.document_ids() == ["a", "a", "a", "b", "b"]
+    assert store.indexed_documents() == {"a": "uploads/a.txt", "b": "uploads/b.txt"}
+
+def test_remove_shifts_rows_and_drops_empty_documents():
+    store = ChunkStore().append(make_chunks("a", 3), 0).append(make_chunks("b", 2), 1)
+    remaining = store.remove(store.positions_of("a"))
+
+    assert list(remaining) == make_chunks("b", 2)
+    assert remaining.documents == [("b", "uploads/b.txt")]
+    assert remaining.positions_of("a").shape == (0,)
+    # The original store is untouched
+    assert len(store) == 5
+
+def test_remove_keeps_text_of_rows_around_the_gap():
+    chunks = make_chunks("a", 4)
+    store = ChunkStore().append(chunks, 0).remove([1, 2])
+
+    assert list(store) == [chunks[0], chunks[3]]
+
+def test_position_finds_chunks_by_document_and_index():
+    store = ChunkStore().append(make_chunks("a", 3), 0).append(make_chunks("b", 2), 0)
+
+    assert store.position("b", 1) == 4
+    assert store.position("a", 0) == 0
+    assert store.position("a", 3) is None
+    assert store.position("a", -1) is None
+    assert store.position("c", 0) is None
+
+def test_from_chunks_keeps_stored_shards():
+    chunks = make_chunks("a", 2)
+    metadata = [{'shard': 2}, {'shard': None}]
+    store = ChunkStore.from_chunks(chunks, metadata)
+
+    assert list(store) == chunks
+    assert store.shard.tolist() == [2, -1]
+    assert store.with_shards(np.array([1, 1])).shard.tolist() == [1, 1]
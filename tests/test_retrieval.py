@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from config import Config
+from rag_system import RAGSystem
+
+QUERY = [1.0, 0.0, 0.0]
+
+class StubEmbeddingModel:
+    """Embeds every text as the query vector; chunk vectors are added to the index directly."""
+
+    def get_sentence_embedding_dimension(self):
+        return 3
+
+    def encode(self, texts, **kwargs):
+        return np.array([QUERY] * len(texts), dtype='float32')
+
+@pytest.fixture
+def rag_system(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "VECTOR_DB_PATH", str(tmp_path))
+    monkeypatch.setattr(Config, "NUM_SHARDS", 2)
+    system = RAGSystem(embedding_model=StubEmbeddingModel())
+    yield system
+    system.index.close()
+
+def add_document(rag_system, document_id, vectors):
+    """Store a document's chunks with the given vectors, one chunk per vector."""
+    vectors = rag_system.normalize_embeddings(np.array(vectors, dtype='float32'))
+    chunks = [
+        {
+            'id': f"{document_id}_chunk_{i}",
+            'document_id': document_id,
+            'document_path': f"uploads/{document_id}.txt",
+            'chunk_index': i,
+            'text': f"{document_id} text {i}",
+            'length': 10
+        }
+        for i in range(len(vectors))
+    ]
+    shard = rag_system.index.route(document_id)
+    rag_system.index.add(vectors, shard)
+    rag_system.chunks = rag_system.chunks.append(chunks, shard)
+
+@pytest.fixture
+def near_duplicates(rag_system):
+    # b repeats a almost exactly; c is less relevant but points elsewhere
+    add_document(rag_system, "a", [[0.95, 0.31, 0.0]])
+    add_document(rag_system, "b", [[0.94, 0.34, 0.0]])
+    add_document(rag_system, "c", [[0.8, -0.6, 0.0]])
+    return rag_system
+
+def chunk_ids(results):
+    return [result['chunk_id'] for result in results]
+
+@pytest.mark.parametrize("diversity", [None, 0])
+def test_without_diversity_results_keep_similarity_order(near_duplicates, diversity):
+    results = near_duplicates.search("query", top_k=2, diversity=diversity)
+
+    assert chunk_ids(results) == ["a_chunk_0", "b_chunk_0"]
+    assert results[0]['score'] > results[1]['score']
+
+def test_diversity_prefers_another_document_over_a_near_duplicate(near_duplicates):
+    retrieval = near_duplicates.retrieve("query", top_k=2, diversity=0.5)
+
+    assert chunk_ids(retrieval['results']) == ["a_chunk_0", "c_chunk_0"]
+    assert retrieval['results'][1]['score'] == pytest.approx(0.8, abs=1e-5)
+    assert retrieval['diversity_ms'] >= 0
+
+def test_neighbors_are_added_in_reading_order_without_duplicates(rag_system):
+    add_document(rag_system, "d", [[0.0, 0.0, 1.0], [0.3, 0.0, 0.95], [1.0, 0.0, 0.0],
+                                   [0.9, 0.43, 0.0], [0.2, 0.98, 0.0]])
+    add_document(rag_system, "e", [[0.5, 0.0, 0.866]])
+
+    results = rag_system.search("query", top_k=2, neighbors=1)
+
+    # d_chunk_3 is both a hit and a neighbour of d_chunk_2, and appears once
+    assert chunk_ids(results) == ["d_chunk_1", "d_chunk_2", "d_chunk_3", "d_chunk_4"]
+    assert [result.get('neighbor_of') for result in results] == ["d_chunk_2", None, None, "d_chunk_3"]
+    # Neighbours are scored against the query from their stored vectors
+    assert results[0]['score'] == pytest.approx(0.3 / np.hypot(0.3, 0.95), abs=1e-5)
+
+def test_neighbors_stay_within_the_document(rag_system):
+    add_document(rag_system, "d", [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+    add_document(rag_system, "e", [[0.0, 0.0, 1.0]])
+
+    results = rag_system.search("query", top_k=1, neighbors=2)
+
+    assert chunk_ids(results) == ["d_chunk_0", "d_chunk_1"]
+    assert [result.get('neighbor_of') for result in results] == [None, "d_chunk_0"]
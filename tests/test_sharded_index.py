@@ -0,0 +1,90 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from sharded_index import ShardedIndex
+
+def random_vectors(count, dimension=16, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, dimension)).astype('float32')
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def build_index(vectors, assignment, num_shards=3, strategy="hash"):
+    index = ShardedIndex(vectors.shape[1], num_shards=num_shards, strategy=strategy)
+    index.assign(vectors, np.asarray(assignment))
+    return index
+
+def test_search_merges_shards_like_brute_force():
+    vectors = random_vectors(200)
+    index = build_index(vectors, np.arange(200) % 3)
+    queries = random_vectors(5, seed=1)
+
+    scores, ids = index.search(queries, 10)
+
+    expected = np.argsort(-(queries @ vectors.T), axis=1, kind='stable')[:, :10]
+    assert ids.tolist() == expected.tolist()
+    assert np.allclose(scores, np.take_along_axis(queries @ vectors.T, expected, axis=1), atol=1e-5)
+    index.close()
+
+def test_search_pads_when_fewer_vectors_than_k():
+    vectors = random_vectors(4)
+    index = build_index(vectors, [0, 1, 0, 1])
+
+    scores, ids = index.search(vectors[:1], 6)
+
+    assert sorted(ids[0, :4].tolist()) == [0, 1, 2, 3]
+    assert ids[0, 4:].tolist() == [-1, -1]
+    assert np.isneginf(scores[0, 4:]).all()
+    index.close()
+
+def test_remove_keeps_global_positions_contiguous():
+    vectors = random_vectors(12)
+    index = build_index(vectors, np.arange(12) % 3)
+
+    index.remove(np.array([1, 4, 5, 11]))
+
+    kept = np.delete(vectors, [1, 4, 5, 11], axis=0)
+    assert index.ntotal == 8
+    assert sorted(np.concatenate(index.shard_ids).tolist()) == list(range(8))
+    assert np.allclose(index.reconstruct_all(), kept)
+    # Every remaining vector is still found at its new position
+    _, ids = index.search(kept, 1)
+    assert ids[:, 0].tolist() == list(range(8))
+    index.close()
+
+def test_assign_and_reconstruct_all_round_trip():
+    vectors = random_vectors(30)
+    assignment = np.array([0] * 10 + [2, 1] * 10)
+    index = build_index(vectors, assignment)
+
+    assert index.shard_sizes() == [10, 10, 10]
+    assert np.array_equal(index.reconstruct_all(), vectors)
+    assert np.array_equal(index.reconstruct(np.array([29, 0, 11])), vectors[[29, 0, 11]])
+
+def test_rebalanced_keeps_each_document_on_one_shard():
+    document_ids = [f"doc{i % 7}" for i in range(70)]
+    vectors = random_vectors(70)
+    index = build_index(vectors, np.zeros(70, dtype='int64'), num_shards=1)
+
+    for num_shards, strategy in [(3, "hash"), (4, "size"), (2, "size")]:
+        rebalanced, assignment = index.rebalanced(document_ids, num_shards=num_shards, strategy=strategy)
+
+        assert rebalanced.num_shards == num_shards
+        assert rebalanced.strategy == strategy
+        for document_id in set(document_ids):
+            shards = {int(assignment[i]) for i, owner in enumerate(document_ids) if owner == document_id}
+            assert len(shards) == 1
+        assert np.array_equal(rebalanced.reconstruct_all(), vectors)
+        assert sum(rebalanced.shard_sizes()) == 70
+    # The source index is untouched
+    assert index.shard_sizes() == [70]
+
+def test_concurrent_searches_share_one_pool():
+    vectors = random_vectors(60)
+    index = build_index(vectors, np.arange(60) % 3)
+
+    with ThreadPoolExecutor(max_workers=8) as callers:
+        list(callers.map(lambda _: index._get_executor(), range(32)))
+        pools = set(callers.map(lambda _: id(index._get_executor()), range(32)))
+
+    assert len(pools) == 1
+    index.close()
@@ -0,0 +1,113 @@
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from chunk_store import ChunkStore
+from snapshot import MAGIC, SnapshotError, read_snapshot, write_snapshot
+
+def make_chunks(document_id, count):
+    return [
+        {
+            'id': f"{document_id}_chunk_{i}",
+            'document_id': document_id,
+            'document_path': f"uploads/{document_id}.txt",
+            'chunk_index': i,
+            'text': f"{document_id} chunk {i} – ünïcode",
+            'length': 20 + i
+        }
+        for i in range(count)
+    ]
+
+def rewrite_header(path, **changes):
+    data = path.read_bytes()
+    (length,) = struct.unpack('<I', data[len(MAGIC):len(MAGIC) + 4])
+    header = json.loads(data[len(MAGIC) + 4:len(MAGIC) + 4 + length])
+    header.update(changes)
+    header_bytes = json.dumps(header).encode('utf-8')
+    path.write_bytes(MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes
+                     + data[len(MAGIC) + 4 + length:])
+
+@pytest.fixture
+def store():
+    return ChunkStore().append(make_chunks("a", 3), 0).append(make_chunks("b", 2), 1)
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).standard_normal((5, 8)).astype('float32')
+
+@pytest.mark.parametrize("compression", ["none", "zlib"])
+def test_round_trip(tmp_path, store, vectors, compression):
+    path = tmp_path / "kb.kbsnap"
+    write_snapshot(str(path), vectors, store, "model", compression=compression)
+    snapshot = read_snapshot(str(path))
+
+    assert snapshot['header']['embedding_model'] == "model"
+    assert np.array_equal(snapshot['vectors'], vectors)
+    assert list(snapshot['store']) == list(store)
+    assert snapshot['store'].shard.tolist() == store.shard.tolist()
+
+def test_empty_round_trip(tmp_path):
+    path = tmp_path / "empty.kbsnap"
+    write_snapshot(str(path), np.empty((0, 8), dtype='float32'), ChunkStore(), "model")
+    snapshot = read_snapshot(str(path))
+
+    assert snapshot['vectors'].shape == (0, 8)
+    assert len(snapshot['store']) == 0
+
+@pytest.mark.parametrize("compression", ["none", "zlib"])
+@pytest.mark.parametrize("offset", [-10, 200])
+def test_corruption_is_detected(tmp_path, store, vectors, compression, offset):
+    path = tmp_path / "kb.kbsnap"
+    write_snapshot(str(path), vectors, store, "model", compression=compression)
+    data = bytearray(path.read_bytes())
+    data[offset] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(SnapshotError):
+        read_snapshot(str(path))
+
+def test_truncation_is_detected(tmp_path, store, vectors):
+    path = tmp_path / "kb.kbsnap"
+    write_snapshot(str(path), vectors, store, "model")
+    path.write_bytes(path.read_bytes()[:-16])
+
+    with pytest.raises(SnapshotError):
+        read_snapshot(str(path))
+
+def test_shard_layout_is_recorded(tmp_path, store, vectors):
+    path = tmp_path / "kb.kbsnap"
+    write_snapshot(str(path), vectors, store, "model", num_shards=3, shard_strategy="size")
+    header = read_snapshot(str(path))['header']
+
+    assert (header['num_shards'], header['shard_strategy']) == (3, "size")
+
+@pytest.mark.parametrize("layout", [
+    {'num_shards': 0, 'shard_strategy': "hash"},
+    {'num_shards': "2", 'shard_strategy': "hash"},
+    {'num_shards': 2, 'shard_strategy': "random"}
+])
+def test_unknown_shard_layout_is_rejected(tmp_path, store, vectors, layout):
+    path = tmp_path / "kb.kbsnap"
+    write_snapshot(str(path), vectors, store, "model", num_shards=2, shard_strategy="hash")
+    rewrite_header(path, **layout)
+
+    with pytest.raises(SnapshotError):
+        read_snapshot(str(path))
+
+@pytest.mark.parametrize("documents, text, text_offsets", [
+    ([(1, "uploads/a.txt")], b"ab", [0, 1, 2]),
+    ([("a", None)], b"ab", [0, 1, 2]),
+    ([("a", "uploads/a.txt"), ("a", "uploads/b.txt")], b"ab", [0, 1, 2]),
+    ([("a", "uploads/a.txt")], b"a\xff", [0, 1, 2]),
+    ([("a", "uploads/a.txt")], "ü".encode('utf-8'), [0, 1, 2])
+])
+def test_malformed_contents_are_rejected(tmp_path, documents, text, text_offsets):
+    # Well-formed files with valid checksums whose contents would break searches
+    store = ChunkStore(documents, [0, 0], [0, 1], [1, 1], [0, 0], text, text_offsets)
+    path = tmp_path / "kb.kbsnap"
+    write_snapshot(str(path), np.zeros((2, 8), dtype='float32'), store, "model")
+
+    with pytest.raises(SnapshotError):
+        read_snapshot(str(path))
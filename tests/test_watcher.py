@@ -0,0 +1,91 @@
+from config import Config
+from watcher import DirectoryWatcher
+
+class FakeRAGSystem:
+    def __init__(self):
+        self.documents = {}
+        self.save_ok = True
+        self.saves = 0
+
+    def add_document(self, file_path, document_id=None, deadline=None, replace=False, save=True):
+        self.documents[document_id] = file_path
+        return {"success": True, "message": "added", "document_id": document_id, "chunks_count": 1}
+
+    def remove_document(self, document_id, save=True):
+        if self.documents.pop(document_id, None) is None:
+            return {"success": False, "message": f"Document not found: {document_id}"}
+        return {"success": True, "message": "removed", "document_id": document_id, "chunks_count": 1}
+
+    def indexed_documents(self):
+        return dict(self.documents)
+
+    def save_index(self):
+        self.saves += 1
+        return self.save_ok
+
+def make_watcher(tmp_path, monkeypatch, rag_system, **kwargs):
+    monkeypatch.setattr(Config, "VECTOR_DB_PATH", str(tmp_path / "vector_db"))
+    (tmp_path / "vector_db").mkdir()
+    directory = tmp_path / "docs"
+    directory.mkdir()
+    return DirectoryWatcher(rag_system, directory=str(directory), interval=0, debounce=0, **kwargs), directory
+
+def sync(watcher):
+    watcher.detect_changes()
+    return watcher.poll()
+
+def test_index_updates_go_through_run_job(tmp_path, monkeypatch):
+    jobs = []
+
+    def run_job(fn, *args, **kwargs):
+        jobs.append(fn.__name__)
+        return fn(*args, **kwargs)
+
+    rag_system = FakeRAGSystem()
+    watcher, directory = make_watcher(tmp_path, monkeypatch, rag_system, run_job=run_job)
+    (directory / "notes.txt").write_text("first")
+    sync(watcher)
+    (directory / "notes.txt").unlink()
+    sync(watcher)
+
+    assert jobs == ['add_document', 'save_index', 'remove_document', 'save_index']
+    assert rag_system.documents == {}
+
+def test_document_id_skips_ids_held_by_other_files(tmp_path, monkeypatch):
+    rag_system = FakeRAGSystem()
+    watcher, directory = make_watcher(tmp_path, monkeypatch, rag_system)
+    uploaded = tmp_path / "uploads" / "report.pdf"
+    rag_system.documents["report"] = str(uploaded)
+
+    assert watcher.document_id_for("report.txt", rag_system.indexed_documents()) == "report.txt"
+    assert watcher.document_id_for("summary.txt", rag_system.indexed_documents()) == "summary"
+
+    rag_system.documents["summary"] = str(directory / "summary.txt")
+    assert watcher.document_id_for("summary.txt", rag_system.indexed_documents()) == "summary"
+
+def test_records_document_id_chosen_by_index(tmp_path, monkeypatch):
+    rag_system = FakeRAGSystem()
+    rag_system.add_document = lambda file_path, document_id=None, **kwargs: {
+        "success": True, "message": "added", "document_id": f"{document_id}.txt", "chunks_count": 1
+    }
+    watcher, directory = make_watcher(tmp_path, monkeypatch, rag_system)
+    (directory / "notes.txt").write_text("first")
+    sync(watcher)
+
+    assert watcher.files["notes.txt"]["document_id"] == "notes.txt"
+
+def test_state_is_not_saved_ahead_of_a_failed_index_save(tmp_path, monkeypatch):
+    rag_system = FakeRAGSystem()
+    watcher, directory = make_watcher(tmp_path, monkeypatch, rag_system)
+    (directory / "notes.txt").write_text("first")
+
+    rag_system.save_ok = False
+    sync(watcher)
+    assert not (tmp_path / "vector_db" / DirectoryWatcher.STATE_FILE).exists()
+
+    # The next scan retries the save even with nothing new to apply
+    rag_system.save_ok = True
+    sync(watcher)
+    assert rag_system.saves == 2
+    state = DirectoryWatcher(rag_system, directory=str(directory)).files
+    assert list(state) == ["notes.txt"]
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Directory watcher that keeps a document folder in sync with the knowledge base
+"""
+
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import Config
+
+class DirectoryWatcher:
+    """Polls a directory tree and applies new, modified and deleted files incrementally.
+
+    Files are compared by mtime and size on every scan and by content hash
+    before re-ingesting, so touching a file does not re-embed it. A change
+    is only applied once the file has stopped changing for `debounce`
+    seconds, and all changes to one file between scans collapse into one.
+    
+    Index updates and saves go through `run_job(fn, *args, **kwargs)`, which
+    by default calls `fn` directly; the server passes one that runs them on
+    its ingestion queue so they share its limits and yield to searches.
+    """
+
+    SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.txt')
+    STATE_FILE = "watch_state.json"
+
+    def __init__(self, rag_system, directory: str = None, interval: float = None,
+                 debounce: float = None, batch_size: int = None, run_job: Callable = None):
+        self.config = Config()
+        self.rag_system = rag_system
+        self.run_job = run_job or (lambda fn, *args, **kwargs: fn(*args, **kwargs))
+        self.directory = directory or self.config.WATCH_DIR
+        self.interval = interval if interval is not None else self.config.WATCH_INTERVAL
+        self.debounce = debounce if debounce is not None else self.config.WATCH_DEBOUNCE
+        self.batch_size = batch_size or self.config.WATCH_BATCH_SIZE
+        self.state_path = os.path.join(self.config.VECTOR_DB_PATH, self.STATE_FILE)
+
+        # Files already applied to the index, keyed by path relative to the directory
+        self.files: Dict[str, Dict] = {}
+        # Changes waiting to settle: path -> (signature or None if deleted, time of last change)
+        self.pending: Dict[str, Tuple[Optional[Tuple[int, int]], float]] = {}
+
+        self.stats = {
+            'scans': 0,
+            'added': 0,
+            'updated': 0,
+            'removed': 0,
+            'unchanged': 0,
+            'failed': 0,
+            'last_scan': None,
+            'last_batch': None
+        }
+
+        # Set while applied changes are waiting for a successful index save
+        self._unsaved = False
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.load_state()
+
+    def load_state(self):
+        """Load the record of already-applied files from disk."""
+        try:
+            if os.path.exists(self.state_path):
+                with open(self.state_path, 'r') as f:
+                    state = json.load(f)
+                if state.get('directory') == os.path.abspath(self.directory):
+                    self.files = state.get('files', {})
+        except Exception as e:
+            print(f"Error loading watcher state: {e}")
+
+    def save_state(self):
+        """Save the record of applied files to disk."""
+        try:
+            with open(self.state_path, 'w') as f:
+                json.dump({'directory': os.path.abspath(self.directory), 'files': self.files}, f)
+        except Exception as e:
+            print(f"Error saving watcher state: {e}")
+
+    def scan(self) -> Dict[str, Tuple[int, int]]:
+        """Return the (mtime_ns, size) signature of every supported file in the tree."""
+        signatures = {}
+        for root, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if Path(filename).suffix.lower() not in self.SUPPORTED_EXTENSIONS:
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # Removed between listing and stat
+                rel_path = Path(os.path.relpath(path, self.directory)).as_posix()
+                signatures[rel_path] = (stat.st_mtime_ns, stat.st_size)
+        return signatures
+
+    @staticmethod
+    def file_hash(path: str) -> str:
+        """SHA-256 of a file's contents, read in blocks."""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def document_id_for(self, rel_path: str, indexed: Dict[str, str]) -> str:
+        """Document id for a file: its relative path without extension, unless another file holds it.
+
+        Both files tracked by the watcher and documents already in the index
+        count, so `notes.txt` does not take over the id of an uploaded `notes.pdf`.
+        """
+        document_id = Path(rel_path).with_suffix('').as_posix()
+        for other_path, entry in self.files.items():
+            if other_path != rel_path and entry['document_id'] == document_id:
+                return rel_path
+        owner = indexed.get(document_id)
+        if owner is not None and os.path.abspath(owner) != os.path.abspath(os.path.join(self.directory, rel_path)):
+            return rel_path
+        return document_id
+
+    def detect_changes(self, now: float = None) -> List[str]:
+        """Scan the tree and return paths whose changes have settled for the debounce period."""
+        now = time.monotonic() if now is None else now
+        signatures = self.scan()
+
+        observed = {}
+        for rel_path, signature in signatures.items():
+            entry = self.files.get(rel_path)
+            if entry is None or (entry['mtime'], entry['size']) != tuple(signature):
+                observed[rel_path] = signature
+        for rel_path in self.files:
+            if rel_path not in signatures:
+                observed[rel_path] = None
+
+        # Files that went back to their applied state no longer need work
+        for rel_path in list(self.pending):
+            if rel_path not in observed:
+                del self.pending[rel_path]
+
+        ready = []
+        for rel_path, signature in observed.items():
+            previous = self.pending.get(rel_path)
+            if previous is None or previous[0] != signature:
+                self.pending[rel_path] = (signature, now)
+            elif now - previous[1] >= self.debounce:
+                ready.append(rel_path)
+
+        self.stats['scans'] += 1
+        self.stats['last_scan'] = time.time()
+        return sorted(ready)
+
+    def apply_change(self, rel_path: str, indexed: Dict[str, str]) -> str:
+        """Apply one settled change to the index and return what was done."""
+        signature, _ = self.pending.pop(rel_path)
+        entry = self.files.get(rel_path)
+        path = os.path.join(self.directory, rel_path)
+
+        if signature is None:
+            del self.files[rel_path]
+            result = self.run_job(self.rag_system.remove_document, entry['document_id'], save=False)
+            # A document that never produced chunks is not in the index
+            if not result["success"] and entry.get('error') is None:
+                print(f"[watcher] {rel_path}: {result['message']}")
+            return 'removed'
+
+        content_hash = self.file_hash(path)
+        mtime, size = signature
+        if entry is not None and entry['sha256'] == content_hash:
+            entry['mtime'], entry['size'] = mtime, size
+            return 'unchanged'
+
+        # A file already ingested through /upload only needs to be recorded
+        if entry is None:
+            for document_id, document_path in indexed.items():
+                if os.path.abspath(document_path) == os.path.abspath(path):
+                    self.files[rel_path] = {
+                        'mtime': mtime, 'size': size, 'sha256': content_hash,
+                        'document_id': document_id, 'error': None
+                    }
+                    return 'unchanged'
+
+        document_id = entry['document_id'] if entry else self.document_id_for(rel_path, indexed)
+        result = self.run_job(self.rag_system.add_document, path, document_id, replace=True, save=False)
+        if result["success"]:
+            # The index may have stored it under a different id to avoid a clash
+            document_id = result["document_id"]
+        self.files[rel_path] = {
+            'mtime': mtime, 'size': size, 'sha256': content_hash,
+            'document_id': document_id, 'error': None if result["success"] else result["message"]
+        }
+        if not result["success"]:
+            # Drop stale chunks of a previous version that can no longer be processed
+            if entry is not None:
+                self.run_job(self.rag_system.remove_document, document_id, save=False)
+            print(f"[watcher] {rel_path}: {result['message']}")
+            return 'failed'
+        return 'updated' if entry else 'added'
+
+    def poll(self) -> Dict:
+        """Run one scan and apply every settled change in batches."""
+        ready = self.detect_changes()
+        if not ready:
+            if self._unsaved:
+                self.persist()
+            return {'applied': 0, 'pending': len(self.pending)}
+
+        indexed = self.rag_system.indexed_documents()
+        total_batches = (len(ready) + self.batch_size - 1) // self.batch_size
+        for batch_number, start in enumerate(range(0, len(ready), self.batch_size), 1):
+            batch = ready[start:start + self.batch_size]
+            counts = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0, 'failed': 0}
+
+            for rel_path in batch:
+                try:
+                    outcome = self.apply_change(rel_path, indexed)
+                except Exception as e:
+                    # The file stays unrecorded, so the next scan picks it up again
+                    print(f"[watcher] Error processing {rel_path}: {e}")
+                    outcome = 'failed'
+                counts[outcome] += 1
+                self.stats[outcome] += 1
+
+            # Persist once per batch rather than once per document
+            self.persist()
+
+            self.stats['last_batch'] = {'time': time.time(), **counts}
+            print(f"[watcher] Batch {batch_number}/{total_batches}: "
+                  f"+{counts['added']} ~{counts['updated']} -{counts['removed']} "
+                  f"={counts['unchanged']} !{counts['failed']} "
+                  f"({min(start + len(batch), len(ready))}/{len(ready)} changes)")
+
+        return {'applied': len(ready), 'pending': len(self.pending)}
+
+    def persist(self) -> bool:
+        """Save the index, then the record of applied files if the index was saved."""
+        if not self.run_job(self.rag_system.save_index):
+            # The record must not get ahead of the store on disk, or changes
+            # lost with a restart would never be applied again
+            print("[watcher] Index save failed; keeping the previous state and retrying next scan")
+            self._unsaved = True
+            return False
+        self.save_state()
+        self._unsaved = False
+        return True
+
+    def run(self):
+        """Poll until stopped."""
+        print(f"[watcher] Watching {os.path.abspath(self.directory)} every {self.interval}s")
+        while not self._stop_event.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"[watcher] Error scanning {self.directory}: {e}")
+            self.wait(self.interval)
+
+    def start(self):
+        """Start polling in a background thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self.run, name="directory-watcher", daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep for up to `timeout` seconds; returns True early once the watcher is stopping."""
+        return self._stop_event.wait(timeout)
+
+    def stop(self):
+        """Stop the background thread."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+            self._thread = None
+
+    def get_status(self) -> Dict:
+        """Progress and counters for the watcher."""
+        return {
+            'directory': os.path.abspath(self.directory),
+            'running': self._thread is not None and self._thread.is_alive(),
+            'tracked_files': len(self.files),
+            'pending_changes': len(self.pending),
+            **self.stats
+        }
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Keep a document directory in sync with the knowledge base. "
+                    "Run this instead of WATCH_UPLOADS when the server is not running."
+    )
+    parser.add_argument("--dir", default=None, help="Directory to watch (default: WATCH_DIR)")
+    parser.add_argument("--interval", type=float, default=None, help="Seconds between scans")
+    parser.add_argument("--debounce", type=float, default=None,
+                        help="Seconds a file must stay unchanged before it is applied")
+    parser.add_argument("--once", action="store_true", help="Sync the directory once and exit")
+    args = parser.parse_args()
+
+    from rag_system import RAGSystem
+
+    watcher = DirectoryWatcher(RAGSystem(), directory=args.dir, interval=args.interval,
+                               debounce=args.debounce)
+
+    if args.once:
+        # Two scans separated by the debounce period settle every change
+        watcher.detect_changes()
+        time.sleep(watcher.debounce)
+        result = watcher.poll()
+        print(f"Synced {result['applied']} change(s), {result['pending']} still settling")
+        return
+
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        print("\nWatcher stopped")
+
+if __name__ == "__main__":
+    main()